@@ -1,18 +1,62 @@
 import json
 import os
+import threading
+import time
 import traceback
-from openai import OpenAI
+from openai import OpenAI, BadRequestError
 
 from utils import FileStrategy, get_filename_ext, vprint, EXT_TO_STRATEGY
+from deadline import Deadline, DeadlineExceeded, request_timeout, run_with_deadline
+from conversation import Conversation, record_request
+from transcription import transcribe_audio
+from vision import image_inputs
 
 # Import all tools from their respective modules.
-from tools import TOOL_REGISTRY
+from tools import TOOL_REGISTRY, FILE_TOOL_REGISTRY
+from tools.tabular_analysis import describe_table, release_table, tabular_query
 
 # Define the system prompt that guides the AI's behavior.
 # This prompt instructs the model on how to structure its responses,
 # ensuring the final output is in a consistent and parsable format.
 INSTRUCTIONS = "You are a general AI assistant. I will ask you a question. Report your thoughts, and finish your answer with the following template: FINAL ANSWER: [YOUR FINAL ANSWER]. YOUR FINAL ANSWER should be a number OR as few words as possible OR a comma separated list of numbers and/or strings. If you are asked for a number, don't use comma to write your number neither use units such as $ or percent sign unless specified otherwise. If you are asked for a string, don't use articles, neither abbreviations (e.g. for cities), and write the digits in plain text unless specified otherwise. If you are asked for a comma separated list, apply the above rules depending of whether the element to be put in the list is a number or a string."
 
+# Message added to the conversation when the time to answer is almost over.
+TIME_UP_INSTRUCTIONS = "You are out of time. Do not call any more tools: report the final answer now, based on what you know so far, using the template FINAL ANSWER: [YOUR FINAL ANSWER]."
+
+# Message asking the model to review its answer, used to decide whether to escalate in a cascade.
+SELF_CHECK_INSTRUCTIONS = "Review the question, the tool results and your final answer above. Is the answer fully supported by them, does it answer exactly what was asked, and does it follow the required format? Reply with AGREE or DISAGREE only."
+
+# Prices in USD per million input and output tokens, used to estimate the cost of each model.
+MODEL_PRICES = {
+    "gpt-4.1": (2.00, 8.00),
+    "gpt-4.1-mini": (0.40, 1.60),
+    "gpt-4.1-nano": (0.10, 0.40),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4o-mini": (0.15, 0.60),
+}
+
+# Questions, escalations, time and cost of every model of the cascades, across all agents.
+cascade_stats: dict[str, dict] = {}
+_stats_lock = threading.Lock()
+
+# Seconds of the time limit kept aside to force a final answer when time runs low,
+# and at most this fraction of the time limit, so that short limits still leave time to work.
+FINAL_ANSWER_RESERVE = 20
+FINAL_ANSWER_RESERVE_RATIO = 0.2
+
+# Tool offered along with tabular files, so that the model can fall back to running
+# arbitrary code in a remote container when tabular_query is not enough.
+CODE_INTERPRETER_FALLBACK = {
+    "type": "function",
+    "name": "enable_code_interpreter",
+    "description": "Enables the code interpreter tool with the attached table file loaded in it. Use it only if the question cannot be answered with the tabular_query tool.",
+    "parameters": {
+        "type": "object",
+        "properties": {},
+        "required": []
+    }
+}
+
 def _call_function(name, args) -> str:
     """
     Dispatches function calls to the appropriate tool based on the function name.
@@ -24,7 +68,53 @@ def _call_function(name, args) -> str:
     Returns:
         str: The result from the called function.
     """
-    return TOOL_REGISTRY[name](**args)
+    func = TOOL_REGISTRY.get(name) or FILE_TOOL_REGISTRY[name]
+    return func(**args)
+
+def _record_tier(model: str, seconds: float, usage: dict, escalated: bool):
+    input_price, output_price = MODEL_PRICES.get(model, (0.0, 0.0))
+    with _stats_lock:
+        stats = cascade_stats.setdefault(
+            model, {"questions": 0, "escalations": 0, "seconds": 0.0, "input_tokens": 0, "output_tokens": 0, "cost": 0.0}
+        )
+        stats["questions"] += 1
+        stats["escalations"] += int(escalated)
+        stats["seconds"] += seconds
+        stats["input_tokens"] += usage["input_tokens"]
+        stats["output_tokens"] += usage["output_tokens"]
+        stats["cost"] += (usage["input_tokens"] * input_price + usage["output_tokens"] * output_price) / 1_000_000
+
+def cascade_report() -> str:
+    """
+    Returns the escalation rate, the average latency and the average cost of every model used.
+    Costs only include the agent's own calls, not the ones made by the tools.
+    """
+    lines = []
+    with _stats_lock:
+        for model, stats in cascade_stats.items():
+            questions = stats["questions"]
+            lines.append(
+                f"{model}: {questions} questions, "
+                f"{stats['escalations'] / questions:.0%} escalated, "
+                f"{stats['seconds'] / questions:.1f}s and ${stats['cost'] / questions:.4f} per question"
+            )
+    return "\n".join(lines)
+
+def _delete(kind: str, delete, resource_id: str):
+    """
+    Deletes a resource from the server, logging failures so that the other resources
+    are still deleted and the answer is still returned.
+    """
+    try:
+        delete(resource_id)
+    except Exception as e:
+        print(f"Failed to delete {kind} {resource_id}: {e}")
+
+def _new_resources() -> dict:
+    """
+    Returns an empty record of the resources created to handle the file of a question.
+    """
+    return {"files": [], "containers": [], "tools": [], "tables": []}
 
 class GAIAAgent:
     """
@@ -32,48 +122,81 @@ class GAIAAgent:
     It orchestrates a conversation with an AI model, allowing it to use tools to answer questions.
     """
 
-    def __init__(self, model: str = "gpt-4.1-mini"):
+    def __init__(
+        self,
+        model: str = "gpt-4.1-mini",
+        cascade: list[str] | None = None,
+        self_check: bool = True,
+        chain_responses: bool = False
+    ):
         """
         Initializes the agent.
 
         Args:
             model (str): The name of the OpenAI model to use.
+            cascade (list[str] | None): The models to try in order, from the cheapest to the most
+                capable, escalating when an answer looks unreliable. Replaces model if given.
+            self_check (bool): Whether the models of a cascade review their answers before
+                settling for them, escalating if they disagree with them.
+            chain_responses (bool): Whether to store the responses on the server and chain them
+                by ID, sending only the new items with every request instead of the full history.
+                Falls back to the full history if the responses cannot be stored.
         """
         # Initialize the OpenAI client, which is the main interface for interacting with the API.
         self.client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
         self.model = model
+        self.cascade = cascade
+        self.self_check = self_check
+        self.chain_responses = chain_responses
         
         # This schema informs the model about the available tools, their names, descriptions, and arguments.
         self.tools = [
             func._as_tool for func in TOOL_REGISTRY.values()
         ]
 
-        # Initialize conversation history for potential multi-turn conversations
-        self.history = []
+        # Tools that are only available while answering the current question
+        self.file_tools = []
+        # Files whose tables are loaded in memory for the current question
+        self.loaded_tables = []
+        # Files and containers created for the current question, deleted when it is answered
+        self.created_files = []
+        self.created_containers = []
+        # Responses stored on the server for the current question, in chained mode
+        self.stored_responses = []
+        # Seconds kept aside to force a final answer for the current question
+        self.final_answer_reserve = FINAL_ANSWER_RESERVE
+
+        # The conversation of the last question, kept to measure its memory when profiling
+        self.conversation = None
 
     def __call__(
         self,
         question: str, 
         file_path: str, 
-        max_iterations: int = 10
+        max_iterations: int = 10,
+        time_limit: float = 300
     ) -> str:
         """
-        Executes the ReAct loop to answer a user's question.
+        Answers a user's question. With a cascade, the models are tried in order, moving to
+        the next one only when the answer of the current one looks unreliable.
 
         Args:
             question (str): The user's question.
             file_path (str): The path to the file passed as input if it exists.
             max_iterations (int): The maximum number of tool-use iterations to prevent infinite loops.
+            time_limit (float): The maximum wall-clock time in seconds to answer the question.
 
         Returns:
             str: The final answer from the AI model.
         """
         vprint(f"> Agent received question: {question}")
+        deadline = Deadline(time_limit)
+        self.final_answer_reserve = min(FINAL_ANSWER_RESERVE, time_limit * FINAL_ANSWER_RESERVE_RATIO)
 
         try:            
             if file_path:
                 user_content = [
-                    self._handle_file(file_path),
+                    *self._run_file_phase(deadline.remaining() - self.final_answer_reserve, self._handle_file, file_path),
                     {
                         "type": "input_text",
                         "text": question
@@ -84,71 +207,25 @@ class GAIAAgent:
                 # No file provided or unsupported file type
                 user_content = question
 
-            # Start the conversation with the system prompt and the user's question.
-            history = [
-                {"role": "developer", "content": INSTRUCTIONS},
-                {"role": "user", "content": user_content}
-            ]
-
-            # The main loop for the agent's reasoning and acting process.
-            for i in range(max_iterations):
-                vprint(f"{' ' * 2}Iteration {i+1}...")
-                # Call the OpenAI Response API with the current conversation history and available tools.
-                response = self.client.responses.create(
-                    model=self.model,
-                    input=history,
-                    tools=self.tools,
-                    tool_choice="auto",  # Let the model decide when to use tools.
-                    temperature=0,       # Set temperature to 0 for deterministic and focused outputs.
-                    store=False
-                )
-                
-                response_outputs = response.output
-
-                # Check if any function calls were made in this iteration
-                no_tool_calls = True
-                for output in response_outputs:
-                    # Skip non-function outputs (like text responses)
-                    if output.type != "function_call":
-                        vprint(f"{' ' * 4}- {output.type}")
-                        continue
-
-                    # We found at least one function call
-                    no_tool_calls = False
-
-                    # Extract function call details
-                    tool_name = output.name
-                    tool_args = json.loads(output.arguments)
-
-                    vprint(f"{' ' * 4}- Calling tool: {tool_name} with args: {tool_args}")
-
-                    # Execute the function call
-                    result = _call_function(tool_name, tool_args)
-                    
-                    # Truncate very long results for logging purposes
-                    max_line_length = 120
-                    if len(result) < max_line_length:
-                        vprint(f"{' ' * 6}Result: {repr(result)}")
-                    else:
-                        postfix = " [...]" if result[max_line_length - 1].isalnum() else "[...]"
-                        vprint(f"{' ' * 6}Result: {repr(result[:max_line_length] + postfix)}")
-                    
-                    # Add the function call and its result to conversation history
-                    history.append(output)
-                    history.append({
-                        "type": "function_call_output",
-                        "call_id": output.call_id,
-                        "output": str(result)
-                    })
-
-                # If no tools were called, the model has provided a final answer
-                if no_tool_calls:
-                    answer = response.output_text
-                    vprint(f"{' ' * 2}Answer: {repr(answer)}")
-                    # Extract the final answer from the model's response
-                    final_answer = answer.split("FINAL ANSWER:")[-1].strip()
-                    return final_answer
+            models = self.cascade or [self.model]
+            for tier, model in enumerate(models):
+                start = time.perf_counter()
+                usage = {"input_tokens": 0, "output_tokens": 0}
+                answer, conversation, signals = self._run(model, user_content, file_path, max_iterations, deadline, usage)
+
+                is_last = tier == len(models) - 1
+                # Double check answers that look fine before settling for a smaller model
+                if not signals and not is_last and self.self_check:
+                    signals = self._self_check(model, conversation, deadline, usage)
 
+                # Escalating is pointless without the time to run the next model
+                escalate = bool(signals) and not is_last and deadline.remaining() > self.final_answer_reserve
+                _record_tier(model, time.perf_counter() - start, usage, escalate)
+                if not escalate:
+                    return answer
+                vprint(f"{' ' * 2}Escalating from {model} to {models[tier + 1]} ({', '.join(signals)})")
+
+        except DeadlineExceeded:
             return "No answer found."
     
         except Exception as e:
@@ -158,63 +235,359 @@ class GAIAAgent:
         finally:
             self._cleanup()
 
-    def _handle_file(self, file_path: str) -> dict:
+    def _run(
+        self,
+        model: str,
+        user_content: str | list,
+        file_path: str,
+        max_iterations: int,
+        deadline: Deadline,
+        usage: dict
+    ) -> tuple[str, Conversation, list[str]]:
+        """
+        Executes the ReAct loop to answer a user's question with a given model.
+
+        Returns:
+            tuple[str, Conversation, list[str]]: The final answer, the conversation, and the
+            signals that the answer may be unreliable.
+        """
+        signals = []
+
+        # Start the conversation with the system prompt and the user's question.
+        conversation = Conversation(
+            [
+                {"role": "developer", "content": INSTRUCTIONS},
+                {"role": "user", "content": user_content}
+            ],
+            chained=self.chain_responses
+        )
+        self.conversation = conversation
+
+        # The main loop for the agent's reasoning and acting process.
+        for i in range(max_iterations):
+            vprint(f"{' ' * 2}Iteration {i+1} ({model})...")
+            # Keep enough time aside to ask for a final answer if this iteration runs late
+            budget = deadline.remaining() - self.final_answer_reserve
+            if budget <= 0:
+                return self._force_final_answer(model, conversation, deadline, usage), conversation, signals + ["timeout"]
+
+            # Call the OpenAI Response API with the current conversation and available tools.
+            try:
+                response = self._create(
+                    model,
+                    usage,
+                    budget,
+                    conversation,
+                    tool_choice="auto"  # Let the model decide when to use tools.
+                )
+            except DeadlineExceeded:
+                return self._force_final_answer(model, conversation, deadline, usage), conversation, signals + ["timeout"]
+            conversation.advance(response)
+            
+            response_outputs = response.output
+
+            # Check if any function calls were made in this iteration
+            no_tool_calls = True
+            for output in response_outputs:
+                # Skip non-function outputs (like text responses)
+                if output.type != "function_call":
+                    vprint(f"{' ' * 4}- {output.type}")
+                    continue
+
+                # We found at least one function call
+                no_tool_calls = False
+
+                # Extract function call details
+                tool_name = output.name
+                tool_args = json.loads(output.arguments)
+
+                vprint(f"{' ' * 4}- Calling tool: {tool_name} with args: {tool_args}")
+
+                # Execute the function call within the time left
+                budget = deadline.remaining() - self.final_answer_reserve
+                try:
+                    if tool_name == CODE_INTERPRETER_FALLBACK["name"]:
+                        result = self._run_file_phase(budget, self._enable_code_interpreter, file_path)
+                    else:
+                        result = run_with_deadline(f"tool:{tool_name}", budget, _call_function, tool_name, tool_args)
+                except Exception as e:
+                    result = f"Error: {e}"
+
+                if isinstance(result, str) and result.startswith("Error") and "tool_error" not in signals:
+                    signals.append("tool_error")
+                
+                # Truncate very long results for logging purposes
+                max_line_length = 120
+                if len(result) < max_line_length:
+                    vprint(f"{' ' * 6}Result: {repr(result)}")
+                else:
+                    postfix = " [...]" if result[max_line_length - 1].isalnum() else "[...]"
+                    vprint(f"{' ' * 6}Result: {repr(result[:max_line_length] + postfix)}")
+                
+                # Add the function call and its result to the conversation
+                conversation.add(output, from_model=True)
+                conversation.add({
+                    "type": "function_call_output",
+                    "call_id": output.call_id,
+                    "output": str(result)
+                })
+
+            # If no tools were called, the model has provided a final answer
+            if no_tool_calls:
+                answer = response.output_text
+                conversation.add({"role": "assistant", "content": answer}, from_model=True)
+                if "FINAL ANSWER:" not in answer:
+                    signals.append("malformed_answer")
+                return self._final_answer(answer), conversation, signals
+
+        return "No answer found.", conversation, signals + ["max_iterations"]
+
+    def _create(
+        self,
+        model: str,
+        usage: dict,
+        timeout: float,
+        conversation: Conversation,
+        extra: list | None = None,
+        **kwargs
+    ):
+        """
+        Calls the OpenAI Response API with the conversation within the given time, adding the
+        tokens used to usage.
+
+        Args:
+            extra (list | None): Items to send with this request only.
+        """
+        arguments = conversation.request(extra)
+        mode = "chained" if conversation.chained else "full"
+        size = record_request(mode, arguments["input"])
+        vprint(f"{' ' * 4}[request: {size} bytes, {mode} mode]")
+        try:
+            response = run_with_deadline(
+                f"model:{model}",
+                timeout,
+                self.client.responses.create,
+                model=model,
+                tools=self.tools + self.file_tools,
+                temperature=0,       # Set temperature to 0 for deterministic and focused outputs.
+                store=conversation.chained,
+                timeout=timeout,
+                **arguments,
+                **kwargs
+            )
+        except BadRequestError as e:
+            if not conversation.chained or e.param not in ("store", "previous_response_id"):
+                raise
+            print(f"Response chaining failed, falling back to full history: {e}")
+            if e.param == "store":
+                # Storing responses is disabled for the organization: stop chaining them for good
+                self.chain_responses = False
+            conversation.disable_chaining()
+            return self._create(model, usage, timeout, conversation, extra, **kwargs)
+
+        if conversation.chained:
+            self.stored_responses.append(response.id)
+        if response.usage:
+            usage["input_tokens"] += response.usage.input_tokens
+            usage["output_tokens"] += response.usage.output_tokens
+        return response
+
+    def _self_check(self, model: str, conversation: Conversation, deadline: Deadline, usage: dict) -> list[str]:
+        """
+        Asks the model to review its own answer.
+
+        Returns:
+            list[str]: The escalation signal if the model disagrees with its answer, nothing otherwise.
+        """
+        try:
+            response = self._create(
+                model,
+                usage,
+                deadline.remaining() - self.final_answer_reserve,
+                conversation,
+                extra=[{"role": "developer", "content": SELF_CHECK_INSTRUCTIONS}],
+                tool_choice="none"
+            )
+        except DeadlineExceeded:
+            return []
+        verdict = response.output_text.strip().upper()
+        vprint(f"{' ' * 2}Self-check: {verdict}")
+        return ["self_check"] if "DISAGREE" in verdict else []
+
+    def _force_final_answer(self, model: str, conversation: Conversation, deadline: Deadline, usage: dict) -> str:
+        """
+        Asks the model for a final answer without letting it use tools, in the time left.
+
+        Returns:
+            str: The final answer from the AI model.
+        """
+        vprint(f"{' ' * 2}Running out of time, forcing a final answer...")
+        response = self._create(
+            model,
+            usage,
+            deadline.remaining(),
+            conversation,
+            extra=[{"role": "developer", "content": TIME_UP_INSTRUCTIONS}],
+            tool_choice="none"
+        )
+        return self._final_answer(response.output_text)
+
+    def _final_answer(self, answer: str) -> str:
+        """
+        Extracts the final answer from the model's response.
+        """
+        vprint(f"{' ' * 2}Answer: {repr(answer)}")
+        return answer.split("FINAL ANSWER:")[-1].strip()
+
+    def _run_file_phase(self, timeout: float, func, file_path: str):
+        """
+        Runs a function handling the file passed as input within the given time, then keeps the
+        resources it created for the current question. If the function is abandoned, the
+        resources it creates once it completes are released instead, as the question is over.
+
+        Returns:
+            The result of the function.
+        """
+        try:
+            result, resources = run_with_deadline("file", timeout, func, file_path)
+        except DeadlineExceeded as e:
+            e.future.add_done_callback(self._release_late)
+            raise
+        self.created_files += resources["files"]
+        self.created_containers += resources["containers"]
+        self.file_tools += resources["tools"]
+        self.loaded_tables += resources["tables"]
+        return result
+
+    def _release_late(self, future):
+        if future.cancelled() or future.exception() is not None:
+            return
+        _, resources = future.result()
+        vprint(f"Releasing the resources created by an abandoned call: {resources}")
+        self._release(resources)
+
+    def _handle_file(self, file_path: str) -> tuple[list[dict], dict]:
         """
-        Handles the file passed as input.
+        Handles the file passed as input. It may run in a worker thread, so it returns the
+        resources it creates instead of keeping them itself.
 
         Returns:
-            dict: A dictionary containing the additional content to be passed to the model.
+            tuple[list[dict], dict]: The additional content items to be passed to the model,
+            and the resources created for the question.
         """
+        resources = _new_resources()
         # Handle different file types by preparing appropriate content format
         if EXT_TO_STRATEGY[get_filename_ext(file_path)] == FileStrategy.VISION:
-            # For image files: upload for vision processing
-            file = self.client.files.create(
-                file=open(file_path, "rb"),
-                purpose="vision"
-            )
-            return {
-                "type": "input_image",
-                "file_id": file.id,
-            }
+            # For image files: downscale and send inline or upload for vision processing
+            inputs = image_inputs(self.client, file_path, chained=self.chain_responses)
+            resources["files"] += [item["file_id"] for item in inputs if "file_id" in item]
+            return inputs, resources
         
         elif EXT_TO_STRATEGY[get_filename_ext(file_path)] == FileStrategy.TRANSCRIPTION:
-            # For audio files: transcribe and include transcript in the question
-            transcript = self.client.audio.transcriptions.create(
-                model="gpt-4o-transcribe",
-                file=open(file_path, "rb"),
-                temperature=0
-            )
-            return {
+            # For audio files: transcribe (in parallel chunks if long) and include transcript in the question
+            transcript = transcribe_audio(self.client, file_path)
+            return [{
                 "type": "input_text",
-                "text": f"### Transcript of the audio file: \"{transcript.text}\""
+                "text": f"### Transcript of the audio file: \"{transcript}\""
+            }], resources
+
+        elif EXT_TO_STRATEGY[get_filename_ext(file_path)] == FileStrategy.TABULAR:
+            # For tables: load them locally and give the model their schema and a summary
+            try:
+                description = describe_table(file_path)
+            except Exception as e:
+                # Tables that cannot be loaded locally go to the code interpreter below
+                release_table(file_path)
+                vprint(f"{' ' * 2}Could not load the table, falling back to the code interpreter: {e}")
+            else:
+                resources["tables"].append(file_path)
+                resources["tools"] += [tabular_query._as_tool, CODE_INTERPRETER_FALLBACK]
+                return [{
+                    "type": "input_text",
+                    "text": description
+                }], resources
+
+        # For code/data files: create a container for code interpretation
+        file = self.client.files.create(
+            file=open(file_path, "rb"),
+            purpose="assistants",
+            timeout=request_timeout(default=120)
+        )
+        resources["files"].append(file.id)
+        container = self.client.containers.create(name="code_interpreter", timeout=request_timeout(default=120))
+        resources["containers"].append(container.id)
+        resources["tools"].append(
+            {
+                "type": "code_interpreter",
+                "container": container.id
             }
+        )
+        return [{
+            "type": "input_file",
+            "file_id": file.id
+        }], resources
 
-        else:
-            # For code/data files: create a container for code interpretation
-            file = self.client.files.create(
-                file=open(file_path, "rb"),
-                purpose="assistants"
-            )
-            container = self.client.containers.create(name="code_interpreter")
-            self.tools.append(
-                {
-                    "type": "code_interpreter",
-                    "container": container.id
-                }
-            )
-            return {
-                "type": "input_file",
-                "file_id": file.id
+    def _enable_code_interpreter(self, file_path: str) -> tuple[str, dict]:
+        """
+        Uploads the file passed as input to a new container and enables the code interpreter on it.
+
+        Returns:
+            tuple[str, dict]: The message for the model, and the resources created for the question.
+        """
+        resources = _new_resources()
+        if any(tool["type"] == "code_interpreter" for tool in self.file_tools):
+            return "The code interpreter is already enabled.", resources
+        file = self.client.files.create(
+            file=open(file_path, "rb"),
+            purpose="assistants",
+            timeout=request_timeout(default=120)
+        )
+        resources["files"].append(file.id)
+        container = self.client.containers.create(
+            name="code_interpreter",
+            file_ids=[file.id],
+            timeout=request_timeout(default=120)
+        )
+        resources["containers"].append(container.id)
+        resources["tools"].append(
+            {
+                "type": "code_interpreter",
+                "container": container.id
             }
-            
+        )
+        return f"The code interpreter is enabled. The file is available in its container as {os.path.basename(file_path)}.", resources
+
     def _cleanup(self):
         """
         Cleans up any resources used by the agent, such as uploaded files or containers.
         """
-        # Delete all uploaded files
-        for file in self.client.files.list():
-            self.client.files.delete(file.id)
-        
-        # Delete all containers
-        for container in self.client.containers.list():
-            self.client.containers.delete(container.id)
\ No newline at end of file
+        resources = {
+            "files": self.created_files,
+            "containers": self.created_containers,
+            "tables": self.loaded_tables
+        }
+        self.file_tools = []
+        self.loaded_tables = []
+        self.created_files = []
+        self.created_containers = []
+        self._release(resources)
+
+        # Delete the responses stored on the server to chain the requests
+        stored_responses, self.stored_responses = self.stored_responses, []
+        for response_id in stored_responses:
+            _delete("response", self.client.responses.delete, response_id)
+
+    def _release(self, resources: dict):
+        """
+        Releases the tables, files and containers created for a question.
+        """
+        for file_path in resources.get("tables", []):
+            release_table(file_path)
+
+        # Delete the files uploaded for this question only, as other agents may be running
+        for file_id in resources.get("files", []):
+            _delete("file", self.client.files.delete, file_id)
+
+        # Delete the containers created for this question
+        for container_id in resources.get("containers", []):
+            _delete("container", self.client.containers.delete, container_id)
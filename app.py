@@ -1,8 +1,18 @@
+import functools
 import os
+import shutil
+import tempfile
+import threading
 import gradio as gr
 import requests
 import pandas as pd
-from agent import GAIAAgent
+from agent import GAIAAgent, cascade_report
+from attachments import AttachmentPrefetcher
+from deadline import phase_report
+from tools.web_search import search_report
+from tools.wikipedia_retrieval import prefetch_report
+from jobs import Job, JobManager
+from profiling import MemoryGrowthError, MemoryProfiler
 
 # (Keep Constants as is)
 # --- Constants ---
@@ -17,89 +27,104 @@ class BasicAgent:
         print(f"Agent returning fixed answer: {fixed_answer}")
         return fixed_answer
 
-def run_and_submit_all( profile: gr.OAuthProfile | None):
-    """
-    Fetches all questions, runs the BasicAgent on them, submits all answers,
-    and displays the results.
-    """
-    # --- Determine HF Space Runtime URL and Repo URL ---
-    space_id = os.getenv("SPACE_ID") # Get the SPACE_ID for sending link to the code
+# Agents keep the state of the question they are answering, so every worker thread has its own
+_agents = threading.local()
 
-    if profile:
-        username= f"{profile.username}"
-        print(f"User logged in: {username}")
-    else:
-        print("User not logged in.")
-        return "Please Login to Hugging Face with the button.", None
+# Models tried in order for every question, escalating to the next one only when needed
+AGENT_CASCADE = os.getenv("AGENT_CASCADE", "gpt-4.1-mini,gpt-4.1").split(",")
 
-    api_url = DEFAULT_API_URL
-    questions_url = f"{api_url}/questions"
-    submit_url = f"{api_url}/submit"
-    files_url = f"{api_url}/files"
+# Whether the agents chain their requests by response ID instead of resending the full history
+AGENT_CHAIN_RESPONSES = os.getenv("AGENT_CHAIN_RESPONSES", "false").lower() == "true"
 
-    # 1. Instantiate Agent ( modify this part to create your agent)
-    try:
-        agent = GAIAAgent("gpt-4.1")
-    except Exception as e:
-        print(f"Error instantiating agent: {e}")
-        return f"Error initializing agent: {e}", None
-    # In the case of an app running as a hugging Face space, this link points toward your codebase ( usefull for others so please keep it public)
-    agent_code = f"https://huggingface.co/spaces/{space_id}/tree/main"
-    print(agent_code)
+# Evaluation jobs of all users run on this shared pool of workers, visible to every request
+job_manager = JobManager(max_workers=int(os.getenv("AGENT_WORKERS", "4")))
 
-    # 2. Fetch Questions
-    print(f"Fetching questions from: {questions_url}")
-    try:
-        response = requests.get(questions_url, timeout=15)
-        response.raise_for_status()
-        questions_data = response.json()
-        if not questions_data:
-            print("Fetched questions list is empty.")
-            return "Fetched questions list is empty or invalid format.", None
-        print(f"Fetched {len(questions_data)} questions.")
-    except requests.exceptions.RequestException as e:
-        print(f"Error fetching questions: {e}")
-        return f"Error fetching questions: {e}", None
-    except requests.exceptions.JSONDecodeError as e:
-        print(f"Error decoding JSON response from questions endpoint: {e}")
-        print(f"Response text: {response.text[:500]}")
-        return f"Error decoding server response for questions: {e}", None
-    except Exception as e:
-        print(f"An unexpected error occurred fetching questions: {e}")
-        return f"An unexpected error occurred fetching questions: {e}", None
+# With AGENT_PROFILE_MEMORY=true, the memory is profiled after every question, and jobs report
+# whether it grows by more than AGENT_MAX_GROWTH_KB per question
+memory_profiler = None
+if os.getenv("AGENT_PROFILE_MEMORY", "false").lower() == "true":
+    max_growth_kb = os.getenv("AGENT_MAX_GROWTH_KB")
+    memory_profiler = MemoryProfiler(
+        max_growth_per_question=float(max_growth_kb) * 1024 if max_growth_kb else None,
+        tracked={"jobs.JobManager.jobs": job_manager.jobs}
+    )
 
-    # 3. Run your Agent
-    results_log = []
-    answers_payload = []
-    print(f"Running agent on {len(questions_data)} questions...")
-    for item in questions_data:
-        task_id = item.get("task_id")
-        question_text = item.get("question")
-        file_name = item.get("file_name")
+def _get_agent() -> GAIAAgent:
+    if not hasattr(_agents, "agent"):
+        _agents.agent = GAIAAgent(cascade=AGENT_CASCADE, chain_responses=AGENT_CHAIN_RESPONSES)
+    return _agents.agent
 
-        if not task_id or question_text is None:
-            print(f"Skipping item with missing task_id or question: {item}")
-            continue
+def _answer_question(item: dict, prefetcher: AttachmentPrefetcher) -> dict:
+    """
+    Runs the agent on a single question, with its attached file if any, as downloaded by the prefetcher.
 
+    Returns:
+        dict: The row to display in the results table and the answer to submit (None on error).
+    """
+    task_id = item.get("task_id")
+    question_text = item.get("question")
+    file_name = item.get("file_name")
+    file_path = None
+
+    try:
         if file_name:
-            file_response = requests.get(f'{files_url}/{task_id}')
-            with open(file_name, "wb") as fp:
-                fp.write(file_response.content)
-        
+            file_path = prefetcher.get(task_id, file_name)
+
+        submitted_answer = _get_agent()(question_text, file_path)
+        result = {
+            "log": {"Task ID": task_id, "Question": question_text, "Submitted Answer": submitted_answer},
+            "answer": {"task_id": task_id, "submitted_answer": submitted_answer}
+        }
+    except Exception as e:
+        print(f"Error running agent on task {task_id}: {e}")
+        result = {
+            "log": {"Task ID": task_id, "Question": question_text, "Submitted Answer": f"AGENT ERROR: {e}"},
+            "answer": None
+        }
+    finally:
+        if file_path and os.path.exists(file_path):
+            os.remove(file_path)
+
+    if memory_profiler:
+        # Profiling must never lose the answer
         try:
-            submitted_answer = agent(question_text, file_name)
-            answers_payload.append({"task_id": task_id, "submitted_answer": submitted_answer})
-            results_log.append({"Task ID": task_id, "Question": question_text, "Submitted Answer": submitted_answer})
+            print(memory_profiler.question_done(_get_agent(), label=task_id))
         except Exception as e:
-            print(f"Error running agent on task {task_id}: {e}")
-            results_log.append({"Task ID": task_id, "Question": question_text, "Submitted Answer": f"AGENT ERROR: {e}"})
+            print(f"Error profiling the memory after task {task_id}: {e}")
+    return result
 
-        if file_name:
-            os.remove(file_name)
+def _results_table(job: Job) -> pd.DataFrame:
+    return pd.DataFrame([
+        result["log"] if isinstance(result, dict) else {"Submitted Answer": f"AGENT ERROR: {result}"}
+        for result in job.completed_results()
+    ])
+
+def _stream_job(job: Job):
+    """
+    Yields the status, the partial results and the ID of a job until it is done.
+    """
+    while not job.done.wait(timeout=1):
+        yield job.summary(), _results_table(job), job.id
+    status = f"{job.summary()}\n{job.outcome}" if job.outcome else job.summary()
+    yield f"{status}\n{cascade_report()}\n{phase_report()}\n{search_report()}\n{prefetch_report()}", _results_table(job), job.id
 
+def _submit_answers(job: Job, username: str, agent_code: str, submit_url: str) -> str:
+    """
+    Submits the answers of a completed job.
+
+    Returns:
+        str: The final status of the submission.
+    """
+    if job.cancelled.is_set():
+        return "Job cancelled: answers not submitted."
+
+    answers_payload = [
+        result["answer"] for result in job.completed_results()
+        if isinstance(result, dict) and result["answer"]
+    ]
     if not answers_payload:
         print("Agent did not produce any answers to submit.")
-        return "Agent did not produce any answers to submit.", pd.DataFrame(results_log)
+        return "Agent did not produce any answers to submit."
 
     # 4. Prepare Submission 
     submission_data = {"username": username.strip(), "agent_code": agent_code, "answers": answers_payload}
@@ -120,8 +145,7 @@ def run_and_submit_all( profile: gr.OAuthProfile | None):
             f"Message: {result_data.get('message', 'No message received.')}"
         )
         print("Submission successful.")
-        results_df = pd.DataFrame(results_log)
-        return final_status, results_df
+        return final_status
     except requests.exceptions.HTTPError as e:
         error_detail = f"Server responded with status {e.response.status_code}."
         try:
@@ -131,23 +155,149 @@ def run_and_submit_all( profile: gr.OAuthProfile | None):
             error_detail += f" Response: {e.response.text[:500]}"
         status_message = f"Submission Failed: {error_detail}"
         print(status_message)
-        results_df = pd.DataFrame(results_log)
-        return status_message, results_df
+        return status_message
     except requests.exceptions.Timeout:
         status_message = "Submission Failed: The request timed out."
         print(status_message)
-        results_df = pd.DataFrame(results_log)
-        return status_message, results_df
+        return status_message
     except requests.exceptions.RequestException as e:
         status_message = f"Submission Failed: Network error - {e}"
         print(status_message)
-        results_df = pd.DataFrame(results_log)
-        return status_message, results_df
+        return status_message
     except Exception as e:
         status_message = f"An unexpected error occurred during submission: {e}"
         print(status_message)
-        results_df = pd.DataFrame(results_log)
-        return status_message, results_df
+        return status_message
+
+def run_and_submit_all( profile: gr.OAuthProfile | None):
+    """
+    Fetches all questions, runs the agent on them as a background job, streams the
+    results as they complete, and submits all answers once the job is done.
+    """
+    # --- Determine HF Space Runtime URL and Repo URL ---
+    space_id = os.getenv("SPACE_ID") # Get the SPACE_ID for sending link to the code
+
+    if profile:
+        username= f"{profile.username}"
+        print(f"User logged in: {username}")
+    else:
+        print("User not logged in.")
+        yield "Please Login to Hugging Face with the button.", None, ""
+        return
+
+    api_url = DEFAULT_API_URL
+    questions_url = f"{api_url}/questions"
+    submit_url = f"{api_url}/submit"
+    files_url = f"{api_url}/files"
+
+    # 1. Instantiate Agent ( modify this part to create your agent)
+    # The workers build their own agents: this one only checks that the configuration is valid
+    try:
+        GAIAAgent(cascade=AGENT_CASCADE, chain_responses=AGENT_CHAIN_RESPONSES)
+    except Exception as e:
+        print(f"Error instantiating agent: {e}")
+        yield f"Error initializing agent: {e}", None, ""
+        return
+    # In the case of an app running as a hugging Face space, this link points toward your codebase ( usefull for others so please keep it public)
+    agent_code = f"https://huggingface.co/spaces/{space_id}/tree/main"
+    print(agent_code)
+
+    # 2. Fetch Questions
+    print(f"Fetching questions from: {questions_url}")
+    try:
+        response = requests.get(questions_url, timeout=15)
+        response.raise_for_status()
+        questions_data = response.json()
+        if not questions_data:
+            print("Fetched questions list is empty.")
+            yield "Fetched questions list is empty or invalid format.", None, ""
+            return
+        print(f"Fetched {len(questions_data)} questions.")
+    except requests.exceptions.RequestException as e:
+        print(f"Error fetching questions: {e}")
+        yield f"Error fetching questions: {e}", None, ""
+        return
+    except requests.exceptions.JSONDecodeError as e:
+        print(f"Error decoding JSON response from questions endpoint: {e}")
+        print(f"Response text: {response.text[:500]}")
+        yield f"Error decoding server response for questions: {e}", None, ""
+        return
+    except Exception as e:
+        print(f"An unexpected error occurred fetching questions: {e}")
+        yield f"An unexpected error occurred fetching questions: {e}", None, ""
+        return
+
+    # 3. Run your Agent as a background job, on the workers shared by all users
+    tasks = []
+    for item in questions_data:
+        if not item.get("task_id") or item.get("question") is None:
+            print(f"Skipping item with missing task_id or question: {item}")
+            continue
+        tasks.append(item)
+
+    # Start downloading the attachments right away, so they are on disk when their question comes
+    work_dir = tempfile.mkdtemp(prefix="gaia_")
+    prefetcher = AttachmentPrefetcher(files_url, work_dir)
+    for item in tasks:
+        if item.get("file_name"):
+            prefetcher.prefetch(item["task_id"], item["file_name"])
+
+    def on_done(job: Job) -> str:
+        prefetcher.close()
+        shutil.rmtree(work_dir, ignore_errors=True)
+        outcome = _submit_answers(job, username, agent_code, submit_url)
+        if memory_profiler:
+            outcome += f"\nAverage memory growth per question: {memory_profiler.growth_per_question() / 1024:.1f} KB"
+            try:
+                memory_profiler.check()
+            except MemoryGrowthError as e:
+                outcome += f"\nWARNING: {e}"
+        return outcome
+
+    job = job_manager.submit(
+        username,
+        tasks,
+        functools.partial(_answer_question, prefetcher=prefetcher),
+        on_done=on_done
+    )
+    print(f"Running agent on {len(tasks)} questions as job {job.id}...")
+    yield from _stream_job(job)
+
+def watch_job(job_id: str):
+    """
+    Streams the progress and results of an existing job.
+    """
+    job = job_manager.get(job_id)
+    if job is None:
+        yield f"Job not found: {job_id}", None, job_id
+        return
+    yield from _stream_job(job)
+
+def cancel_job(job_id: str, profile: gr.OAuthProfile | None) -> str:
+    """
+    Cancels a job of the logged in user.
+    """
+    if not profile:
+        return "Please Login to Hugging Face with the button to cancel your jobs."
+    job = job_manager.get(job_id)
+    if job is not None and job.owner != profile.username:
+        return f"Job {job_id} belongs to another user: only its owner can cancel it."
+    if job_manager.cancel(job_id):
+        return f"Job {job_id} cancelled: the running questions will complete, the others are dropped."
+    return f"Job {job_id} not found or not running."
+
+def list_jobs() -> pd.DataFrame:
+    return pd.DataFrame([
+        {
+            "Job ID": job.id,
+            "User": job.owner,
+            "Status": job.status,
+            "Progress": f"{job.completed}/{len(job.tasks)}",
+            "Tasks/min": round(job.throughput() * 60, 1),
+            "ETA (s)": round(job.eta()) if job.eta() is not None else None,
+        }
+        for job in job_manager.list()
+    ])
 
 
 # --- Build Gradio Interface using Blocks ---
@@ -164,6 +314,7 @@ with gr.Blocks() as demo:
         ---
         **Disclaimers:**
         Once clicking on the "submit button, it can take quite some time ( this is the time for the agent to go through all the questions).
+        The evaluation runs as a background job: results appear as questions are answered, and the job keeps running if you leave the page. Use its ID to watch it again or to cancel it.
         This space provides a basic setup and is intentionally sub-optimal to encourage you to develop your own, more robust solution. For instance for the delay process of the submit button, a solution could be to cache the answers and submit in a seperate action or even to answer the questions in async.
         """
     )
@@ -172,13 +323,39 @@ with gr.Blocks() as demo:
 
     run_button = gr.Button("Run Evaluation & Submit All Answers")
 
+    with gr.Row():
+        job_id_box = gr.Textbox(label="Job ID", placeholder="Filled in when a job starts, or paste one to watch it")
+        watch_button = gr.Button("Watch Job")
+        cancel_button = gr.Button("Cancel Job")
+
     status_output = gr.Textbox(label="Run Status / Submission Result", lines=5, interactive=False)
     # Removed max_rows=10 from DataFrame constructor
     results_table = gr.DataFrame(label="Questions and Agent Answers", wrap=True)
 
+    jobs_button = gr.Button("Refresh Jobs")
+    jobs_table = gr.DataFrame(label="All Jobs", wrap=True)
+
+    # Streams last as long as their job: don't let them queue behind the streams of other users,
+    # the work itself is bounded by the shared pool of workers
     run_button.click(
         fn=run_and_submit_all,
-        outputs=[status_output, results_table]
+        outputs=[status_output, results_table, job_id_box],
+        concurrency_limit=None
+    )
+    watch_button.click(
+        fn=watch_job,
+        inputs=[job_id_box],
+        outputs=[status_output, results_table, job_id_box],
+        concurrency_limit=None
+    )
+    cancel_button.click(
+        fn=cancel_job,
+        inputs=[job_id_box],
+        outputs=[status_output]
+    )
+    jobs_button.click(
+        fn=list_jobs,
+        outputs=[jobs_table]
     )
 
 if __name__ == "__main__":
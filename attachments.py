@@ -0,0 +1,102 @@
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from utils import vprint
+
+# Timeouts (connect, read) in seconds of every download request
+DOWNLOAD_TIMEOUT = (10, 60)
+DOWNLOAD_ATTEMPTS = 3
+# Server errors worth retrying a download for
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+CHUNK_SIZE = 1024 * 1024
+
+
+class AttachmentPrefetcher:
+    """
+    Downloads the files attached to the questions in the background, over a pooled HTTP
+    session, streaming them to disk so that they are ready when the agent needs them.
+    """
+
+    def __init__(self, files_url: str, work_dir: str, max_workers: int = 4):
+        """
+        Args:
+            files_url (str): The URL of the files endpoint, followed by the task ID of each file.
+            work_dir (str): The directory where the files are downloaded.
+            max_workers (int): The maximum number of concurrent downloads.
+        """
+        self.files_url = files_url
+        self.work_dir = work_dir
+        self.session = requests.Session()
+        # Downloads are retried by _download, so the adapter only pools the connections
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="attachments")
+        self._downloads: dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def prefetch(self, task_id: str, file_name: str) -> Future:
+        """
+        Starts downloading the file of a task, unless it is already downloaded or downloading.
+        Downloads start in the order they are requested.
+
+        Returns:
+            Future: The future of the path of the downloaded file.
+        """
+        with self._lock:
+            if task_id not in self._downloads:
+                self._downloads[task_id] = self._executor.submit(self._download, task_id, file_name)
+            return self._downloads[task_id]
+
+    def get(self, task_id: str, file_name: str) -> str:
+        """
+        Returns the path of the file of a task, waiting for its download if needed.
+        """
+        return self.prefetch(task_id, file_name).result()
+
+    def close(self):
+        """
+        Cancels the pending downloads and releases the connections.
+        """
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self.session.close()
+
+    def _download(self, task_id: str, file_name: str) -> str:
+        # Every task has its own directory, as different tasks may have files with the same name
+        task_dir = os.path.join(self.work_dir, task_id)
+        os.makedirs(task_dir, exist_ok=True)
+        file_path = os.path.join(task_dir, file_name)
+        partial_path = file_path + ".part"
+        start = time.perf_counter()
+
+        try:
+            self._fetch(task_id, partial_path)
+        except Exception:
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+            raise
+
+        os.replace(partial_path, file_path)
+        vprint(f"Downloaded {file_name} ({os.path.getsize(file_path)} bytes) in {time.perf_counter() - start:.1f}s")
+        return file_path
+
+    def _fetch(self, task_id: str, partial_path: str):
+        # Retry failed connections, transient server errors and downloads interrupted midway
+        for attempt in range(DOWNLOAD_ATTEMPTS):
+            try:
+                with self.session.get(f"{self.files_url}/{task_id}", stream=True, timeout=DOWNLOAD_TIMEOUT) as response:
+                    response.raise_for_status()
+                    with open(partial_path, "wb") as fp:
+                        for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                            fp.write(chunk)
+                return
+            except requests.exceptions.RequestException as e:
+                retryable = not isinstance(e, requests.exceptions.HTTPError) or e.response.status_code in RETRY_STATUSES
+                if not retryable or attempt == DOWNLOAD_ATTEMPTS - 1:
+                    raise
+                time.sleep(2 ** attempt)
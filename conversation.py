@@ -0,0 +1,93 @@
+import json
+import threading
+
+# Requests sent and bytes of input uploaded in each mode, to compare them.
+request_stats = {
+    "full": {"requests": 0, "bytes": 0},
+    "chained": {"requests": 0, "bytes": 0},
+}
+_stats_lock = threading.Lock()
+
+
+class Conversation:
+    """
+    The items exchanged with a model to answer a question.
+
+    In full-history mode, the whole history is sent with every request. In chained mode,
+    the responses are stored on the server and every request only sends the items added
+    since the previous response, referring to it by ID.
+    """
+
+    def __init__(self, items: list, chained: bool = False):
+        """
+        Args:
+            items (list): The items the conversation starts with.
+            chained (bool): Whether to chain the requests by response ID.
+        """
+        self.history = list(items)
+        self.pending = list(items)
+        self.chained = chained
+        self.previous_response_id = None
+
+    def add(self, item, from_model: bool = False):
+        """
+        Adds an item to the conversation.
+
+        Args:
+            item: The item to add.
+            from_model (bool): Whether the item comes from a model response, in which case
+                the server already has it in chained mode.
+        """
+        self.history.append(item)
+        if not from_model:
+            self.pending.append(item)
+
+    def request(self, extra: list | None = None) -> dict:
+        """
+        Returns the arguments of the next request: its input and, in chained mode, the previous response.
+
+        Args:
+            extra (list | None): Items to send with this request only.
+        """
+        extra = extra or []
+        if not self.chained:
+            return {"input": self.history + extra}
+        arguments = {"input": self.pending + extra}
+        if self.previous_response_id:
+            arguments["previous_response_id"] = self.previous_response_id
+        return arguments
+
+    def advance(self, response):
+        """
+        Makes the response the one the next request builds on.
+        """
+        if self.chained:
+            self.previous_response_id = response.id
+            self.pending = []
+
+    def disable_chaining(self):
+        """
+        Switches to full-history mode, e.g. because the responses cannot be stored.
+        """
+        self.chained = False
+        self.previous_response_id = None
+        self.pending = []
+
+
+def record_request(mode: str, input_items: list | str) -> int:
+    """
+    Records a request sent in the given mode.
+
+    Returns:
+        int: The size in bytes of its input.
+    """
+    size = len(json.dumps(input_items, default=_serialize).encode())
+    with _stats_lock:
+        request_stats[mode]["requests"] += 1
+        request_stats[mode]["bytes"] += size
+    return size
+
+
+def _serialize(item) -> dict | str:
+    # Items returned by the API are pydantic models
+    return item.model_dump() if hasattr(item, "model_dump") else str(item)
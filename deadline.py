@@ -0,0 +1,125 @@
+import contextvars
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
+
+from utils import vprint
+
+# Shortest timeout given to a network request, so that it fails fast rather than
+# immediately once the deadline is over.
+MIN_REQUEST_TIMEOUT = 1.0
+
+# Calls that exceed their deadline are abandoned, so keep enough workers for a few hung ones.
+_executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix="deadline")
+
+_current_deadline: contextvars.ContextVar["Deadline | None"] = contextvars.ContextVar("deadline", default=None)
+
+# Number of calls, total duration and timeouts of every phase, to find the slowest ones.
+phase_stats: dict[str, dict] = {}
+_stats_lock = threading.Lock()
+
+
+class DeadlineExceeded(TimeoutError):
+    """
+    Raised when a call does not complete before its deadline.
+    """
+    def __init__(self, phase: str, timeout: float, future: Future | None = None):
+        super().__init__(f"Deadline exceeded in phase '{phase}' after {timeout:.1f}s")
+        self.phase = phase
+        # The abandoned call, which may still complete in the background
+        self.future = future
+
+
+class Deadline:
+    """
+    A point in time by which some work must be done.
+    """
+    def __init__(self, seconds: float):
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        return self.remaining() == 0.0
+
+
+def remaining_time(default: float | None = None) -> float | None:
+    """
+    Returns the time left to the deadline of the current call, or default if there is no deadline.
+    Tools use it to bound their own network requests.
+    """
+    deadline = _current_deadline.get()
+    return deadline.remaining() if deadline else default
+
+
+def request_timeout(default: float) -> float:
+    """
+    Returns the timeout to give to a network request: the time left to the deadline of the
+    current call, or default if there is no deadline, and at least MIN_REQUEST_TIMEOUT.
+    Bounding every request this way lets abandoned calls give their worker back soon.
+    """
+    return max(MIN_REQUEST_TIMEOUT, remaining_time(default=default))
+
+
+def run_with_deadline(phase: str, timeout: float, func, /, *args, **kwargs):
+    """
+    Runs a function in a worker thread, waiting at most timeout seconds for its result.
+    The function sees the timeout through remaining_time(). If it does not finish in time,
+    it is cancelled if it has not started yet, abandoned otherwise.
+
+    Args:
+        phase (str): The name of the phase, used to log durations and timeouts.
+        timeout (float): The maximum time in seconds to wait for the result.
+        func: The function to run, followed by its arguments.
+
+    Returns:
+        The result of the function.
+
+    Raises:
+        DeadlineExceeded: If the function does not finish in time, with the future of the
+            abandoned call, so that the caller can release what it creates once it completes.
+    """
+    deadline = Deadline(timeout)
+    context = contextvars.copy_context()
+    context.run(_current_deadline.set, deadline)
+
+    start = time.monotonic()
+    future = _executor.submit(context.run, func, *args, **kwargs)
+    try:
+        result = future.result(timeout=deadline.remaining())
+    except FuturesTimeoutError:
+        future.cancel()
+        _record(phase, time.monotonic() - start, timed_out=True)
+        error = DeadlineExceeded(phase, timeout, future)
+        vprint(f"{' ' * 4}{error}")
+        raise error from None
+    except Exception:
+        _record(phase, time.monotonic() - start)
+        raise
+
+    elapsed = time.monotonic() - start
+    _record(phase, elapsed)
+    vprint(f"{' ' * 4}[{phase}: {elapsed:.1f}s]")
+    return result
+
+
+def _record(phase: str, elapsed: float, timed_out: bool = False):
+    with _stats_lock:
+        stats = phase_stats.setdefault(phase, {"calls": 0, "seconds": 0.0, "timeouts": 0})
+        stats["calls"] += 1
+        stats["seconds"] += elapsed
+        stats["timeouts"] += int(timed_out)
+
+
+def phase_report() -> str:
+    """
+    Returns the number of calls, the average duration and the timeouts of every phase,
+    from the slowest to the fastest on average.
+    """
+    with _stats_lock:
+        phases = sorted(phase_stats.items(), key=lambda item: item[1]["seconds"] / item[1]["calls"], reverse=True)
+        return "\n".join(
+            f"{phase}: {stats['calls']} calls, {stats['seconds'] / stats['calls']:.1f}s on average, {stats['timeouts']} timeouts"
+            for phase, stats in phases
+        )
@@ -0,0 +1,227 @@
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Callable
+
+
+class Job:
+    """
+    A batch of tasks submitted by a user, whose results become available as the tasks complete.
+    """
+
+    def __init__(self, owner: str, tasks: list, run_task: Callable, on_done: Callable | None = None):
+        """
+        Args:
+            owner (str): The user who submitted the job.
+            tasks (list): The tasks to run.
+            run_task (Callable): The function called on each task, returning its result.
+            on_done (Callable | None): The function called with the job once its tasks are
+                completed or cancelled, returning the outcome of the job.
+        """
+        self.id = uuid.uuid4().hex[:8]
+        self.owner = owner
+        self.tasks = tasks
+        self.run_task = run_task
+        self.on_done = on_done
+        self.outcome = None
+        self.pending = deque(range(len(tasks)))
+        self.results = [None] * len(tasks)
+        self.completed = 0
+        self.running = 0
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.cancelled = threading.Event()
+        self.done = threading.Event()
+
+    @property
+    def status(self) -> str:
+        if self.cancelled.is_set():
+            return "cancelled" if self.done.is_set() else "cancelling"
+        if self.done.is_set():
+            return "done"
+        if self.finished_at:
+            return "finishing"
+        return "running" if self.started_at else "queued"
+
+    def throughput(self) -> float:
+        """
+        Returns the number of tasks completed per second since the job started.
+        """
+        if not self.started_at or not self.completed:
+            return 0.0
+        return self.completed / ((self.finished_at or time.time()) - self.started_at)
+
+    def eta(self) -> float | None:
+        """
+        Returns the estimated number of seconds until the job is done, if it can be estimated.
+        """
+        throughput = self.throughput()
+        if self.finished_at:
+            return 0.0
+        return (len(self.tasks) - self.completed) / throughput if throughput else None
+
+    def summary(self) -> str:
+        eta = self.eta()
+        eta_text = f"{eta:.0f}s" if eta is not None else "n/a"
+        return (
+            f"Job {self.id} ({self.owner}): {self.status}, "
+            f"{self.completed}/{len(self.tasks)} tasks done, "
+            f"{self.throughput() * 60:.1f} tasks/min, ETA {eta_text}"
+        )
+
+    def completed_results(self) -> list:
+        """
+        Returns the results of the tasks completed so far, in the order of the tasks.
+        """
+        return [result for result in self.results if result is not None]
+
+
+class JobManager:
+    """
+    Runs the tasks of all the submitted jobs on a shared pool of worker threads.
+    Workers take tasks from the active jobs in turn, so that every job makes progress
+    at the same pace regardless of how many tasks it has.
+    """
+
+    def __init__(self, max_workers: int = 4, finished_ttl: float = 3600, max_finished: int = 50):
+        """
+        Args:
+            max_workers (int): The number of worker threads.
+            finished_ttl (float): The number of seconds finished jobs are kept for.
+            max_finished (int): The maximum number of finished jobs kept, the most recent ones.
+        """
+        self.finished_ttl = finished_ttl
+        self.max_finished = max_finished
+        self.jobs: dict[str, Job] = {}
+        self._active = deque()
+        self._condition = threading.Condition()
+        for i in range(max_workers):
+            threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True).start()
+
+    def submit(self, owner: str, tasks: list, run_task: Callable, on_done: Callable | None = None) -> Job:
+        """
+        Submits a new job.
+
+        Args:
+            owner (str): The user who submits the job.
+            tasks (list): The tasks to run.
+            run_task (Callable): The function called on each task, returning its result.
+                It should handle its own errors: an exception raised is stored as the result.
+            on_done (Callable | None): The function called with the job once its tasks are
+                completed or cancelled, returning the outcome of the job.
+
+        Returns:
+            Job: The submitted job.
+        """
+        job = Job(owner, tasks, run_task, on_done)
+        with self._condition:
+            self._prune()
+            self.jobs[job.id] = job
+            self._active.append(job)
+            finished = self._finish_if_done(job)
+            self._condition.notify_all()
+        if finished:
+            self._complete(job)
+        return job
+
+    def get(self, job_id: str) -> Job | None:
+        return self.jobs.get(job_id.strip())
+
+    def list(self) -> list[Job]:
+        """
+        Returns the jobs kept, finished ones included, oldest first.
+        """
+        with self._condition:
+            self._prune()
+            return list(self.jobs.values())
+
+    def cancel(self, job_id: str) -> bool:
+        """
+        Cancels a job: its pending tasks are dropped and its running tasks are left to complete.
+
+        Returns:
+            bool: Whether the job was found and was still running.
+        """
+        job = self.get(job_id)
+        if job is None or job.done.is_set():
+            return False
+        with self._condition:
+            if job.cancelled.is_set():
+                return False
+            job.cancelled.set()
+            job.pending.clear()
+            finished = self._finish_if_done(job)
+        if finished:
+            self._complete(job)
+        return True
+
+    def _next_task(self) -> tuple[Job, int]:
+        """
+        Waits for a pending task, taking them from the active jobs in round-robin order.
+        """
+        with self._condition:
+            while not self._active:
+                self._condition.wait()
+            job = self._active.popleft()
+            index = job.pending.popleft()
+            job.running += 1
+            if job.started_at is None:
+                job.started_at = time.time()
+            if job.pending:
+                self._active.append(job)
+            return job, index
+
+    def _work(self):
+        while True:
+            job, index = self._next_task()
+            try:
+                result = job.run_task(job.tasks[index])
+            except Exception as e:
+                result = e
+            with self._condition:
+                job.results[index] = result
+                job.completed += 1
+                job.running -= 1
+                finished = self._finish_if_done(job)
+            if finished:
+                self._complete(job)
+
+    def _finish_if_done(self, job: Job) -> bool:
+        """
+        Marks the job as finished if none of its tasks are pending or running.
+        Must be called while holding the condition.
+
+        Returns:
+            bool: Whether the job has just finished.
+        """
+        if job in self._active and not job.pending:
+            self._active.remove(job)
+        if not job.pending and not job.running and not job.finished_at:
+            job.finished_at = time.time()
+            return True
+        return False
+
+    def _prune(self):
+        """
+        Forgets the finished jobs older than finished_ttl, and the oldest ones beyond max_finished.
+        Must be called while holding the condition.
+        """
+        now = time.time()
+        finished = [job for job in self.jobs.values() if job.done.is_set()]
+        finished.sort(key=lambda job: job.finished_at)
+        expired = [job for job in finished if job.finished_at < now - self.finished_ttl]
+        expired += finished[len(expired):max(len(expired), len(finished) - self.max_finished)]
+        for job in expired:
+            del self.jobs[job.id]
+
+    def _complete(self, job: Job):
+        # Run the completion callback outside the lock, as it may take a while
+        try:
+            if job.on_done:
+                job.outcome = job.on_done(job)
+        except Exception as e:
+            job.outcome = f"Error completing job: {e}"
+        finally:
+            job.done.set()
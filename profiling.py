@@ -0,0 +1,207 @@
+import sys
+import threading
+import tracemalloc
+from collections import deque
+
+import pandas as pd
+
+# The caches and other growing state kept by the tools and helper modules, as
+# (module, attribute, lock guarding it in the module if any)
+CACHES = [
+    ("tools.wikipedia_retrieval", "pages_cache", None),
+    ("tools.wikipedia_retrieval", "prefetched_pages", "_prefetch_lock"),
+    ("tools.web_search", "_recent", "_lock"),
+    ("tools.web_search", "_in_flight", "_lock"),
+    ("tools.youtube_video_analysis", "videos_cache", None),
+    ("tools.tabular_analysis", "frames_cache", None),
+    ("transcription", "chunks_cache", None),
+    ("deadline", "phase_stats", "_stats_lock"),
+]
+
+# Number of attempts to measure an object that other threads keep changing
+MEASURE_ATTEMPTS = 5
+
+# The growth per question is measured from the second question on, so it needs at least this many
+MIN_QUESTIONS = 3
+
+
+class MemoryGrowthError(RuntimeError):
+    """
+    Raised when the memory grows by more than the allowed amount per question.
+    """
+
+
+class MemoryProfiler:
+    """
+    Tracks the memory allocated by the process with tracemalloc, taking a snapshot at every
+    question boundary to find out which allocation sites and caches keep growing.
+    """
+
+    def __init__(
+        self,
+        top: int = 10,
+        max_growth_per_question: int | None = None,
+        frames: int = 5,
+        tracked: dict | None = None
+    ):
+        """
+        Args:
+            top (int): The number of allocation sites to report.
+            max_growth_per_question (int | None): The maximum average growth in bytes allowed per
+                question, checked by check(). No limit if None.
+            frames (int): The number of frames stored for every allocation.
+            tracked (dict | None): Other objects to report the size of, by name, such as the
+                state of instances that CACHES cannot refer to.
+        """
+        self.top = top
+        self.max_growth_per_question = max_growth_per_question
+        self.tracked = tracked or {}
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+        self.previous = self._snapshot()
+        # Memory traced after every question
+        self.traced = []
+        self._lock = threading.Lock()
+
+    def question_done(self, agent=None, label: str = "") -> str:
+        """
+        Takes a snapshot at the end of a question and reports the growth since the previous one.
+
+        Args:
+            agent: The agent that answered the question, to report the size of its state too.
+            label (str): The name of the question in the report.
+
+        Returns:
+            str: The report.
+        """
+        with self._lock:
+            snapshot = self._snapshot()
+            differences = snapshot.compare_to(self.previous, "lineno")
+            self.previous = snapshot
+            current, peak = tracemalloc.get_traced_memory()
+            growth = current - self.traced[-1] if self.traced else 0
+            self.traced.append(current)
+            count = len(self.traced)
+
+        lines = [
+            f"Memory after question {count}{f' ({label})' if label else ''}: "
+            f"{_format(current)} traced ({_format(growth, sign=True)}), peak {_format(peak)}",
+            "Top allocation sites by growth:",
+        ]
+        for stat in differences[:self.top]:
+            frame = stat.traceback[0]
+            lines.append(f"  {frame.filename}:{frame.lineno}: {_format(stat.size_diff, sign=True)} ({stat.count_diff:+d} blocks)")
+        lines.append("Caches:")
+        for name, size in cache_sizes(agent, self.tracked).items():
+            lines.append(f"  {name}: {_format(size)}")
+        return "\n".join(lines)
+
+    def growth_per_question(self) -> float:
+        """
+        Returns the average growth of the traced memory per question, ignoring the first
+        question, which fills the module-level caches and loads the lazy imports.
+        Returns 0 until MIN_QUESTIONS questions are done.
+        """
+        with self._lock:
+            if len(self.traced) < MIN_QUESTIONS:
+                return 0.0
+            return (self.traced[-1] - self.traced[1]) / (len(self.traced) - 2)
+
+    def check(self):
+        """
+        Raises MemoryGrowthError if the memory grows by more than allowed per question,
+        or if too few questions are done to measure it.
+        """
+        if self.max_growth_per_question is None:
+            return
+        with self._lock:
+            count = len(self.traced)
+        if count < MIN_QUESTIONS:
+            raise MemoryGrowthError(
+                f"Only {count} questions done, at least {MIN_QUESTIONS} are needed to measure the memory growth"
+            )
+        growth = self.growth_per_question()
+        if growth > self.max_growth_per_question:
+            raise MemoryGrowthError(
+                f"Memory grows by {_format(growth)} per question, more than the {_format(self.max_growth_per_question)} allowed"
+            )
+
+    def _snapshot(self) -> tracemalloc.Snapshot:
+        return tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+        ])
+
+
+def cache_sizes(agent=None, tracked: dict | None = None) -> dict[str, int]:
+    """
+    Returns the approximate memory in bytes held by every cache, by the tracked objects,
+    and by the state of the agent if given.
+    """
+    objects = []
+    for module_name, attribute, lock in CACHES:
+        module = sys.modules.get(module_name)
+        if module is None:
+            # Don't import a module just to measure it
+            continue
+        objects.append((f"{module_name}.{attribute}", getattr(module, attribute), getattr(module, lock) if lock else None))
+    objects += [(name, obj, None) for name, obj in (tracked or {}).items()]
+    if agent is not None:
+        objects += [("agent.tools", agent.tools, None), ("agent.conversation", agent.conversation, None)]
+
+    sizes = {}
+    for name, obj, lock in objects:
+        size = _measure(obj, lock)
+        if size is not None:
+            sizes[name] = size
+    return sizes
+
+
+def _measure(obj, lock=None) -> int | None:
+    """
+    Measures an object that other threads may change, under the lock guarding it if any.
+    Returns None if it kept changing during every attempt.
+    """
+    for _ in range(MEASURE_ATTEMPTS):
+        try:
+            if lock is None:
+                return _deep_size(obj)
+            with lock:
+                return _deep_size(obj)
+        except RuntimeError:
+            # Changed size while being walked: try again
+            continue
+    return None
+
+
+def _deep_size(obj, seen: set | None = None) -> int:
+    """
+    Estimates the memory used by an object and everything it references.
+    """
+    seen = set() if seen is None else seen
+    if id(obj) in seen or isinstance(obj, type) or type(obj).__name__ == "module":
+        return 0
+    seen.add(id(obj))
+
+    if isinstance(obj, (pd.DataFrame, pd.Series)):
+        return int(obj.memory_usage(deep=True).sum()) if isinstance(obj, pd.DataFrame) else int(obj.memory_usage(deep=True))
+
+    size = sys.getsizeof(obj)
+    # Walk snapshots of the containers, which other threads may be changing
+    if isinstance(obj, dict):
+        size += sum(_deep_size(k, seen) + _deep_size(v, seen) for k, v in list(obj.items()))
+    elif isinstance(obj, (list, tuple, set, frozenset, deque)):
+        size += sum(_deep_size(item, seen) for item in list(obj))
+    elif hasattr(obj, "__dict__") and not callable(obj):
+        size += _deep_size(vars(obj), seen)
+    return size
+
+
+def _format(size: float, sign: bool = False) -> str:
+    prefix = "+" if sign and size > 0 else ""
+    for unit in ("B", "KB", "MB"):
+        if abs(size) < 1024:
+            return f"{prefix}{size:.1f} {unit}"
+        size /= 1024
+    return f"{prefix}{size:.1f} GB"
@@ -10,7 +10,13 @@ import time
 from dotenv import load_dotenv
 load_dotenv(override=True)
 
-from agent import GAIAAgent
+from agent import GAIAAgent, cascade_report
+from conversation import request_stats
+from deadline import phase_report
+from profiling import MemoryGrowthError, MemoryProfiler
+from settings import Settings, get_settings
+from tools.web_search import search_report
+from tools.wikipedia_retrieval import prefetch_report
 
 def print_custom_help():
     help_text = '''\nGaia Agent CLI Utility\n\nUsage:\n  python run.py -q "<question>" -f <file_path>\n\nOptions:\n  -q, --question   The question for the agent (required)\n  -f, --file       Path to an input file (required)\n  -h, --help       Show this help message and exit\n\nExample:\n  python run.py -q 'Summarize this' -f report.pdf\n'''
@@ -58,20 +64,60 @@ def main():
                         help="Path to an input file (read in binary)")
     parser.add_argument("-m", "--openai-model", dest="openai_model", default="gpt-4.1-mini",
                         help="OpenAI model to use (e.g., gpt-4, gpt-3.5-turbo)")
+    parser.add_argument("-c", "--cascade", nargs="+", metavar="MODEL",
+                        help="Models to try in order, escalating to the next one when an answer looks unreliable (e.g., gpt-4.1-mini gpt-4.1)")
+    parser.add_argument("--chain", action="store_true",
+                        help="Chain the requests by response ID instead of resending the full history")
+    parser.add_argument("-t", "--time-limit", dest="time_limit", type=float, default=300,
+                        help="Maximum time in seconds to answer the question")
+    parser.add_argument("--profile-memory", action="store_true",
+                        help="Report the memory growth, its top allocation sites and the size of the caches after every question")
+    parser.add_argument("--soak", type=int, default=0, metavar="N",
+                        help="Answer the question N times with the same agent and profile the memory (implies --profile-memory)")
+    parser.add_argument("--max-growth-kb", type=float, default=None,
+                        help="Fail if the memory grows by more than this many KB per question on average (needs --soak 3 or more)")
+    parser.add_argument("--web-search-similarity", type=float, default=None, metavar="THRESHOLD",
+                        help="Share the answer of a running or recent web search with searches whose words are this similar (0 to 1) and that mention the same numbers and names (default: 1, identical searches only)")
     parser.add_argument("-v", "--verbose", action="store_true",
                         help="Show extra debugging info")
     args = parser.parse_args()
 
+    _settings: Settings = get_settings()
     if args.verbose:
-        from settings import Settings, get_settings
-        _settings: Settings = get_settings()
         _settings.verbose = True
+    if args.web_search_similarity is not None:
+        _settings.web_search_similarity_threshold = args.web_search_similarity
 
+    profiler = None
+    if args.profile_memory or args.soak:
+        max_growth = args.max_growth_kb * 1024 if args.max_growth_kb is not None else None
+        profiler = MemoryProfiler(max_growth_per_question=max_growth)
+
+    reports = []
     with spinner_context(verbose=args.verbose):
-        agent = GAIAAgent(args.openai_model)
-        response = agent(args.question, args.file_path)
+        agent = GAIAAgent(args.openai_model, cascade=args.cascade, chain_responses=args.chain)
+        for i in range(max(args.soak, 1)):
+            response = agent(args.question, args.file_path, time_limit=args.time_limit)
+            if profiler:
+                reports.append(profiler.question_done(agent, label=f"run {i + 1}"))
 
     print(f"Final answer: {response}")
+    if profiler:
+        print("\n\n".join(reports))
+        print(f"Average memory growth per question: {profiler.growth_per_question() / 1024:.1f} KB")
+        try:
+            profiler.check()
+        except MemoryGrowthError as e:
+            print(f"Soak test failed: {e}")
+            sys.exit(1)
+    if args.verbose:
+        print(cascade_report())
+        print(phase_report())
+        print(search_report())
+        print(prefetch_report())
+        for mode, stats in request_stats.items():
+            if stats["requests"]:
+                print(f"{mode} history mode: {stats['requests']} requests, {stats['bytes'] / stats['requests']:.0f} bytes sent per request")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
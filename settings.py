@@ -1,7 +1,9 @@
+import os
 from functools import lru_cache
 
 class Settings:
     _verbose = False
+    _web_search_similarity_threshold = float(os.getenv("WEB_SEARCH_SIMILARITY_THRESHOLD", "1.0"))
 
     @property
     def verbose(self):
@@ -11,6 +13,20 @@ class Settings:
     def verbose(self, value: bool):
         self._verbose = value
 
+    @property
+    def web_search_similarity_threshold(self):
+        """
+        Similarity (between 0 and 1) of the words of two web searches above which they are
+        considered the same, if they also mention the same numbers and named entities.
+        With the default of 1, only searches that are identical once normalized are merged.
+        Defaults to the WEB_SEARCH_SIMILARITY_THRESHOLD environment variable if set.
+        """
+        return self._web_search_similarity_threshold
+
+    @web_search_similarity_threshold.setter
+    def web_search_similarity_threshold(self, value: float):
+        self._web_search_similarity_threshold = value
+
 @lru_cache
 def get_settings() -> Settings:
     """
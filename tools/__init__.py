@@ -2,7 +2,8 @@
 from tools.calculator import evaluate_expression
 from tools.wikipedia_retrieval import wikipedia_page_search, wikipedia_page_sections_retriever, wikipedia_section_content_retriever
 from tools.web_search import web_search
-from tools.youtube_video_analysis import analyze_youtube_video
+from tools.youtube_video_analysis import analyze_youtube_video, analyze_youtube_video_batch
+from tools.tabular_analysis import tabular_query
 
 TOOL_REGISTRY = {
     evaluate_expression.__name__: evaluate_expression,
@@ -11,6 +12,12 @@ TOOL_REGISTRY = {
     wikipedia_section_content_retriever.__name__: wikipedia_section_content_retriever,
     web_search.__name__: web_search,
     analyze_youtube_video.__name__: analyze_youtube_video,
+    analyze_youtube_video_batch.__name__: analyze_youtube_video_batch,
 }
 
-__all__ = ['TOOL_REGISTRY'] # Expose only the TOOL_REGISTRY
+# Tools only offered along with the files they work on
+FILE_TOOL_REGISTRY = {
+    tabular_query.__name__: tabular_query,
+}
+
+__all__ = ['TOOL_REGISTRY', 'FILE_TOOL_REGISTRY'] # Expose only the registries
@@ -0,0 +1,249 @@
+import os
+import pandas as pd
+from tools.tool import tool
+
+# Files bigger than this are read in chunks of CHUNK_ROWS rows, shrinking the integer
+# columns of each chunk before keeping it, so that the full-width chunks are never all
+# in memory at once.
+LARGE_FILE_BYTES = 50 * 1024 * 1024
+CHUNK_ROWS = 100_000
+MAX_SUMMARY_COLUMNS = 50
+MAX_RESULT_ROWS = 100
+
+FILTER_OPERATORS = {
+    "==": lambda s, v: s == v,
+    "!=": lambda s, v: s != v,
+    ">": lambda s, v: s > v,
+    ">=": lambda s, v: s >= v,
+    "<": lambda s, v: s < v,
+    "<=": lambda s, v: s <= v,
+    "contains": lambda s, v: s.astype(str).str.contains(str(v), case=False, regex=False),
+    "in": lambda s, v: s.isin(v if isinstance(v, list) else [v]),
+    "isnull": lambda s, v: s.isna(),
+    "notnull": lambda s, v: s.notna(),
+}
+
+AGGREGATIONS = {"sum", "mean", "median", "min", "max", "count", "nunique", "std"}
+
+# Tables already loaded in memory, keyed by file path and sheet name.
+frames_cache: dict[tuple[str, str], pd.DataFrame] = {}
+
+
+@tool(
+    description = "Runs a query on a CSV or Excel file attached to the question, locally and without writing code. The query is applied in this order: filters, group_by with aggregations (or plain aggregations without group_by), sort, column selection and limit. Use it for questions like filtering rows, summing or averaging columns, counting values or finding the top rows.",
+    parameters = {
+        "type": "object",
+        "properties": {
+            "file_path": {
+                "type": "string",
+                "description": "The path of the file, as given with the table summary."
+            },
+            "sheet": {
+                "type": "string",
+                "description": "The sheet to query for Excel files. Defaults to the first sheet."
+            },
+            "filters": {
+                "type": "array",
+                "description": "Conditions that the rows must all satisfy.",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "column": {"type": "string"},
+                        "op": {"type": "string", "enum": list(FILTER_OPERATORS)},
+                        "value": {"description": "The value to compare with. A list for the 'in' operator, ignored by 'isnull' and 'notnull'."}
+                    },
+                    "required": ["column", "op"]
+                }
+            },
+            "group_by": {
+                "type": "array",
+                "items": {"type": "string"},
+                "description": "Columns to group the rows by."
+            },
+            "aggregations": {
+                "type": "array",
+                "description": "Aggregations to compute, per group if group_by is given, over all rows otherwise.",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "column": {"type": "string"},
+                        "func": {"type": "string", "enum": sorted(AGGREGATIONS)}
+                    },
+                    "required": ["column", "func"]
+                }
+            },
+            "sort_by": {
+                "type": "array",
+                "items": {"type": "string"},
+                "description": "Columns to sort the result by."
+            },
+            "descending": {
+                "type": "boolean",
+                "description": "Whether to sort in descending order."
+            },
+            "columns": {
+                "type": "array",
+                "items": {"type": "string"},
+                "description": "Columns to return. Defaults to all columns."
+            },
+            "limit": {
+                "type": "integer",
+                "description": f"Maximum number of rows to return (at most {MAX_RESULT_ROWS})."
+            }
+        },
+        "required": ["file_path"]
+    }
+)
+def tabular_query(
+    file_path: str,
+    sheet: str = None,
+    filters: list[dict] = None,
+    group_by: list[str] = None,
+    aggregations: list[dict] = None,
+    sort_by: list[str] = None,
+    descending: bool = False,
+    columns: list[str] = None,
+    limit: int = 20
+) -> str:
+    try:
+        df = _loaded_table(file_path, sheet)
+
+        for condition in filters or []:
+            op = FILTER_OPERATORS.get(condition["op"])
+            if op is None:
+                return f"Error: Unsupported filter operator: {condition['op']}"
+            df = df[op(_column(df, condition["column"]), condition.get("value"))]
+
+        group_by = [_column(df, c).name for c in group_by or []]
+        if aggregations:
+            spec = {}
+            for aggregation in aggregations:
+                column, func = _column(df, aggregation["column"]).name, aggregation["func"]
+                if func not in AGGREGATIONS:
+                    return f"Error: Unsupported aggregation: {func}"
+                spec[f"{column}_{func}"] = (column, func)
+            if group_by:
+                df = df.groupby(group_by, dropna=False).agg(**spec).reset_index()
+            else:
+                df = pd.DataFrame({name: [df[col].agg(func)] for name, (col, func) in spec.items()})
+        elif group_by:
+            df = df.groupby(group_by, dropna=False).size().reset_index(name="count")
+
+        if sort_by:
+            df = df.sort_values([_column(df, c).name for c in sort_by], ascending=not descending)
+        if columns:
+            df = df[[_column(df, c).name for c in columns]]
+
+        limit = max(1, min(limit, MAX_RESULT_ROWS))
+        result = df.head(limit).to_csv(index=False)
+        if len(df) > limit:
+            result += f"[... {len(df) - limit} more rows, {len(df)} in total]"
+        return result
+
+    except KeyError as e:
+        return f"Error: {e.args[0]}"
+    except Exception as e:
+        return f"Error: Unexpected error occurred - {str(e)}"
+
+
+def load_table(file_path: str, sheet: str = None) -> pd.DataFrame:
+    """
+    Loads a CSV or Excel file in memory once, reading big CSV files in chunks.
+
+    Args:
+        file_path: The path of the file
+        sheet: The sheet to load for Excel files, the first one if None
+
+    Returns:
+        The table as a DataFrame
+    """
+    if file_path.endswith(".csv"):
+        key = (file_path, "")
+        if key not in frames_cache:
+            if os.path.getsize(file_path) > LARGE_FILE_BYTES:
+                chunks = pd.read_csv(file_path, chunksize=CHUNK_ROWS, memory_map=True, low_memory=False)
+                frames_cache[key] = pd.concat((_downcast(chunk) for chunk in chunks), ignore_index=True)
+            else:
+                frames_cache[key] = pd.read_csv(file_path, memory_map=True)
+        return frames_cache[key]
+
+    if not any(path == file_path for path, _ in frames_cache):
+        for name, df in pd.read_excel(file_path, sheet_name=None).items():
+            frames_cache[(file_path, name)] = df
+    sheets = [name for path, name in frames_cache if path == file_path]
+    key = (file_path, sheet or sheets[0])
+    if key not in frames_cache:
+        raise KeyError(f"Sheet not found: {sheet}. Available sheets: {sheets}")
+    return frames_cache[key]
+
+
+def _downcast(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Stores the integer columns with the smallest type that holds their values, which is lossless.
+    """
+    for column in df.select_dtypes(include="integer").columns:
+        df[column] = pd.to_numeric(df[column], downcast="integer")
+    return df
+
+
+def _loaded_table(file_path: str, sheet: str = None) -> pd.DataFrame:
+    """
+    Returns a table already loaded for the question. The tool never loads files itself,
+    so that the model can only query the files attached to the question.
+    """
+    sheets = [name for path, name in frames_cache if path == file_path]
+    if not sheets:
+        raise KeyError(f"File not attached to the question: {file_path}. Use the exact path given with the table summary.")
+    key = (file_path, sheet or sheets[0])
+    if key not in frames_cache:
+        raise KeyError(f"Sheet not found: {sheet}. Available sheets: {sheets}")
+    return frames_cache[key]
+
+
+def release_table(file_path: str):
+    """
+    Removes all the tables loaded from the given file from memory.
+    """
+    for key in [key for key in frames_cache if key[0] == file_path]:
+        del frames_cache[key]
+
+
+def describe_table(file_path: str) -> str:
+    """
+    Builds a compact description of the schema and content of a CSV or Excel file,
+    to be given to the model before it queries the file.
+    """
+    load_table(file_path)
+    sheets = [(name, df) for (path, name), df in frames_cache.items() if path == file_path]
+
+    lines = [f"### Table file: \"{file_path}\" (query it with the tabular_query tool)"]
+    for name, df in sheets:
+        header = f"Sheet \"{name}\": " if name else ""
+        lines.append(f"{header}{len(df)} rows, {len(df.columns)} columns")
+        for column in df.columns[:MAX_SUMMARY_COLUMNS]:
+            lines.append(f"- {_describe_column(df[column])}")
+        if len(df.columns) > MAX_SUMMARY_COLUMNS:
+            lines.append(f"- [... {len(df.columns) - MAX_SUMMARY_COLUMNS} more columns]")
+        lines.append("First rows:\n" + df.head(5).to_csv(index=False))
+    return "\n".join(lines)
+
+
+def _describe_column(series: pd.Series) -> str:
+    description = f"{series.name!r} ({series.dtype}, {series.notna().sum()} non-null"
+    if pd.api.types.is_numeric_dtype(series) and series.notna().any():
+        description += f", min={series.min():g}, max={series.max():g}, mean={series.mean():g}"
+    else:
+        values = series.dropna().astype(str)
+        top = values.value_counts().head(3).index.tolist()
+        description += f", {values.nunique()} distinct, e.g. {top}"
+    return description + ")"
+
+
+def _column(df: pd.DataFrame, name: str) -> pd.Series:
+    if name in df.columns:
+        return df[name]
+    # Be lenient with the case and surrounding spaces of the column names
+    for column in df.columns:
+        if str(column).strip().lower() == str(name).strip().lower():
+            return df[column]
+    raise KeyError(f"Column not found: {name}. Available columns: {list(df.columns)}")
@@ -1,6 +1,29 @@
 import os
+import re
+import threading
+import time
+import unicodedata
+from concurrent.futures import Future
 from openai import OpenAI
+from deadline import remaining_time
+from settings import Settings, get_settings
 from tools.tool import tool
+from utils import vprint
+
+_settings: Settings = get_settings()
+
+# Answers stay shareable for this many seconds after their request has completed,
+# so that consecutive iterations asking the same thing reuse them.
+RECENT_TTL = 60
+
+# Searches currently running and recently completed ones, keyed by normalized question,
+# with the entities of the question that a near-duplicate must have too.
+_in_flight: dict[str, tuple[frozenset, Future]] = {}
+_recent: dict[str, tuple[float, frozenset, Future]] = {}
+_lock = threading.Lock()
+
+# Number of calls to the tool, and how many of them were served by another call's request.
+stats = {"calls": 0, "requests": 0, "coalesced": 0, "merged": 0}
 
 @tool(
     description = "Answers a question by searching the information on the web. Instructions: Ask for a specific information in form of a question.",
@@ -13,10 +36,57 @@ from tools.tool import tool
             }
         },
         "required": ["question"]
-    }   
+    }
 )
 def web_search(question: str) -> str:
-    client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))    
+    key = _normalize(question)
+    entities = _entities(question)
+    with _lock:
+        stats["calls"] += 1
+
+    while True:
+        with _lock:
+            future, kind = _find_shared(key, entities)
+            is_owner = future is None
+            if is_owner:
+                stats["requests"] += 1
+                future = Future()
+                _in_flight[key] = (entities, future)
+        if is_owner:
+            break
+
+        vprint(f"{' ' * 6}web_search: sharing the answer of an identical search ({_saved_calls()} calls saved so far)")
+        # Wait within our own time, which may be longer than the one of the shared request
+        try:
+            result = future.result(timeout=remaining_time())
+        except Exception as e:
+            if not future.done():
+                # Our own time ran out
+                raise
+            # The shared request failed, possibly because its own time ran out: search ourselves
+            vprint(f"{' ' * 6}web_search: the shared search failed ({e}), searching again")
+            continue
+        with _lock:
+            stats[kind] += 1
+        return result
+
+    try:
+        result = _search(question)
+    except BaseException as e:
+        with _lock:
+            del _in_flight[key]
+        future.set_exception(e)
+        raise
+
+    with _lock:
+        del _in_flight[key]
+        _recent[key] = (time.monotonic() + RECENT_TTL, entities, future)
+    future.set_result(result)
+    return result
+
+
+def _search(question: str) -> str:
+    client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
     response = client.responses.create(
         model="gpt-4.1-mini",
         instructions="Answer the question of the user based on the web search results. Make sure your answer is grounded in the information you find on the web. If you cannot find the information, say so. Don't be too verbose, answer the question in a concise manner.",
@@ -24,6 +94,72 @@ def web_search(question: str) -> str:
         tools=[{"type": "web_search_preview"}],
         tool_choice="required",  # Let the model decide when to use tools.
         temperature=0,       # Set temperature to 0 for deterministic and focused outputs.
-        store=False
+        store=False,
+        timeout=remaining_time(default=600)
     )
-    return response.output_text
\ No newline at end of file
+    return response.output_text
+
+
+def _find_shared(key: str, entities: frozenset) -> tuple[Future | None, str | None]:
+    """
+    Returns the running or recent search that the normalized question can share, if any,
+    with the kind of sharing: "coalesced" for identical questions, "merged" for near-duplicates.
+    Must be called while holding the lock.
+    """
+    now = time.monotonic()
+    for expired in [k for k, (expiry, _, _) in _recent.items() if expiry < now]:
+        del _recent[expired]
+
+    candidates = {**{k: (e, f) for k, (_, e, f) in _recent.items()}, **_in_flight}
+    if key in candidates:
+        return candidates[key][1], "coalesced"
+
+    threshold = _settings.web_search_similarity_threshold
+    if threshold >= 1:
+        return None, None
+    # Only merge questions about the same numbers and named entities, as questions
+    # differing by a year or a name are close but ask for different things
+    words = set(key.split())
+    best_key, best_ratio = None, threshold
+    for other, (other_entities, _) in candidates.items():
+        if other_entities != entities:
+            continue
+        other_words = set(other.split())
+        ratio = len(words & other_words) / len(words | other_words)
+        if ratio >= best_ratio:
+            best_key, best_ratio = other, ratio
+    if best_key is not None:
+        return candidates[best_key][1], "merged"
+    return None, None
+
+
+def _normalize(question: str) -> str:
+    question = unicodedata.normalize("NFKC", question).lower()
+    question = re.sub(r"[^\w\s]", " ", question)
+    return " ".join(question.split())
+
+
+def _entities(question: str) -> frozenset:
+    """
+    Returns the numbers and the capitalized words of the question, except its first word.
+    """
+    words = re.findall(r"\w+", unicodedata.normalize("NFKC", question))
+    return frozenset(
+        word.lower() for i, word in enumerate(words)
+        if any(c.isdigit() for c in word) or (i > 0 and word[0].isupper())
+    )
+
+
+def _saved_calls() -> int:
+    return stats["coalesced"] + stats["merged"]
+
+
+def search_report() -> str:
+    """
+    Returns the number of calls to the tool and how many requests were saved by sharing answers.
+    """
+    with _lock:
+        return (
+            f"web_search: {stats['calls']} calls, {stats['requests']} requests, "
+            f"{_saved_calls()} calls saved ({stats['coalesced']} identical, {stats['merged']} near-duplicates)"
+        )
@@ -1,9 +1,55 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+import requests
 import wikipedia
+from wikipedia import wikipedia as _wikipedia_module
 from bs4 import BeautifulSoup
+from deadline import request_timeout
 from tools.tool import tool
 
+# Timeout in seconds of the requests to Wikipedia made without a deadline, e.g. when prefetching.
+REQUEST_TIMEOUT = 30
+
+
+class _BoundedRequests:
+    """
+    Stands in for the requests module in the wikipedia package, which sends its requests
+    without any timeout, to bound them by the deadline of the current call.
+    """
+    def __getattr__(self, name):
+        return getattr(requests, name)
+
+    def get(self, *args, **kwargs):
+        kwargs.setdefault("timeout", request_timeout(default=REQUEST_TIMEOUT))
+        return requests.get(*args, **kwargs)
+
+
+_wikipedia_module.requests = _BoundedRequests()
+
 pages_cache: dict[str, wikipedia.WikipediaPage] = {}
 
+# After a search, the top results are fetched in the background, since the model
+# usually retrieves the sections of one of them next.
+PREFETCH_TOP_K = 3
+# At most PREFETCH_MAX_BYTES are downloaded by prefetching in any PREFETCH_WINDOW seconds,
+# and at most PREFETCH_MEMORY_BYTES of prefetched pages are kept until they are used.
+PREFETCH_MAX_BYTES = 5 * 1024 * 1024
+PREFETCH_WINDOW = 60
+PREFETCH_MEMORY_BYTES = 20 * 1024 * 1024
+# Size assumed for a prefetch still running, until pages have been downloaded to measure it.
+PREFETCH_ESTIMATED_BYTES = 200 * 1024
+
+# Prefetched pages not retrieved yet, as (page, sections, size), oldest first.
+prefetched_pages: OrderedDict[str, tuple[wikipedia.WikipediaPage, str, int]] = OrderedDict()
+_prefetching: dict[str, Future] = {}
+_downloads: list[tuple[float, int]] = []
+_prefetch_executor = ThreadPoolExecutor(max_workers=PREFETCH_TOP_K, thread_name_prefix="wikipedia-prefetch")
+_prefetch_lock = threading.Lock()
+
+prefetch_stats = {"prefetched": 0, "hits": 0, "misses": 0, "cached": 0, "skipped": 0, "cancelled": 0, "evicted": 0}
+
 @tool(
     description = "Tool that searches for a Wikipedia page based on a query.",
     parameters = {
@@ -18,7 +64,10 @@ pages_cache: dict[str, wikipedia.WikipediaPage] = {}
     }
 )
 def wikipedia_page_search(query: str):
-    return wikipedia.search(query)
+    results = wikipedia.search(query)
+    for title in results[:PREFETCH_TOP_K]:
+        _start_prefetch(title)
+    return results
 
     
 @tool(
@@ -36,9 +85,21 @@ def wikipedia_page_search(query: str):
 )
 def wikipedia_page_sections_retriever(page_title: str):
     try:
-        page = wikipedia.page(title=page_title, auto_suggest=False)
+        if page_title in pages_cache:
+            # Retrieved before: the page keeps its sections and HTML once fetched
+            page = pages_cache[page_title]
+            sections, _ = _get_page_sections(page)
+            with _prefetch_lock:
+                prefetch_stats["cached"] += 1
+            return "Page title: " + page.title + "\nSections:" + str(sections)
+        prefetched = _take_prefetched(page_title)
+        if prefetched:
+            page, sections = prefetched
+        else:
+            page = wikipedia.page(title=page_title, auto_suggest=False)
+            sections, _ = _get_page_sections(page)
         pages_cache[page.title] = page
-        return "Page title: " + page.title + "\nSections:" + str(_get_page_sections(page))
+        return "Page title: " + page.title + "\nSections:" + str(sections)
     except wikipedia.DisambiguationError as e:
         return "Disambiguation required. Call this tool again with one of the following options: " + str(e.options)
 
@@ -74,8 +135,94 @@ def _get_page_sections_from_html(page_html: str) -> list[str]:
     return [h2.text for h2 in h2s]
 
 
-def _get_page_sections(page: wikipedia.WikipediaPage):
+def _get_page_sections(page: wikipedia.WikipediaPage) -> tuple[str | list[str], int]:
+    """
+    Returns the sections of the page, and the size of the HTML fetched to find them, if any.
+    """
     if page.sections:
-        return str(page.sections)
+        return str(page.sections), 0
     else:
-        return _get_page_sections_from_html(page.html())
\ No newline at end of file
+        html = page.html()
+        return _get_page_sections_from_html(html), len(html.encode())
+
+
+def prefetch_hit_rate() -> float:
+    """
+    Returns the fraction of section retrievals of new pages served by a prefetched page.
+    """
+    lookups = prefetch_stats["hits"] + prefetch_stats["misses"]
+    return prefetch_stats["hits"] / lookups if lookups else 0.0
+
+
+def prefetch_report() -> str:
+    """
+    Returns the hit rate of the prefetched pages and what happened to the prefetches.
+    """
+    with _prefetch_lock:
+        stats = dict(prefetch_stats)
+    return (
+        f"Wikipedia prefetch: {prefetch_hit_rate():.0%} hit rate ({stats['hits']} hits, {stats['misses']} misses), "
+        f"{stats['cached']} retrievals served from the cache, {stats['prefetched']} prefetched, "
+        f"{stats['skipped']} skipped, {stats['cancelled']} cancelled, {stats['evicted']} evicted"
+    )
+
+
+def _start_prefetch(title: str):
+    with _prefetch_lock:
+        if title in _prefetching or title in prefetched_pages or title in pages_cache:
+            return
+        # Respect the bandwidth cap over the last window, counting the running prefetches too
+        now = time.monotonic()
+        _downloads[:] = [(t, size) for t, size in _downloads if t > now - PREFETCH_WINDOW]
+        downloaded = sum(size for _, size in _downloads)
+        estimated = downloaded / len(_downloads) if _downloads else PREFETCH_ESTIMATED_BYTES
+        if downloaded + len(_prefetching) * estimated >= PREFETCH_MAX_BYTES:
+            prefetch_stats["skipped"] += 1
+            return
+        _prefetching[title] = _prefetch_executor.submit(_prefetch, title)
+
+
+def _prefetch(title: str):
+    """
+    Fetches a page with its content and parses its sections, keeping it until it is retrieved.
+    """
+    try:
+        page = wikipedia.page(title=title, auto_suggest=False)
+        sections, html_size = _get_page_sections(page)
+        size = len(page.content.encode()) + html_size
+    except Exception:
+        # Disambiguations and errors are left to the retrieval tool
+        with _prefetch_lock:
+            _prefetching.pop(title, None)
+        return
+
+    with _prefetch_lock:
+        _prefetching.pop(title, None)
+        _downloads.append((time.monotonic(), size))
+        prefetch_stats["prefetched"] += 1
+        prefetched_pages[title] = (page, sections, size)
+        # Respect the memory cap, dropping the oldest prefetched pages first
+        while sum(entry[2] for entry in prefetched_pages.values()) > PREFETCH_MEMORY_BYTES:
+            prefetched_pages.popitem(last=False)
+            prefetch_stats["evicted"] += 1
+
+
+def _take_prefetched(title: str) -> tuple[wikipedia.WikipediaPage, str] | None:
+    """
+    Returns the prefetched page and sections for the title, waiting for its prefetch if running.
+    A prefetch that has not started yet is cancelled, as fetching the page directly is faster
+    than waiting behind other prefetches.
+    """
+    with _prefetch_lock:
+        future = _prefetching.get(title)
+        if future is not None and future.cancel():
+            del _prefetching[title]
+            prefetch_stats["cancelled"] += 1
+            future = None
+    if future is not None:
+        future.result()
+
+    with _prefetch_lock:
+        entry = prefetched_pages.pop(title, None)
+        prefetch_stats["hits" if entry else "misses"] += 1
+    return entry[:2] if entry else None
@@ -1,10 +1,28 @@
+import json
 import os
+import re
+import threading
 from google import genai
-from google.genai.types import Part, Content, FileData
+from google.genai.types import Part, Content, FileData, GenerateContentConfig, HttpOptions
+from deadline import remaining_time, request_timeout
 from tools.tool import tool
+from utils import vprint
 
 client = genai.Client(api_key=os.getenv("GOOGLE_API_KEY"))
 
+MODEL = 'models/gemini-2.0-flash'
+# Timeout in seconds of the requests made without a deadline
+REQUEST_TIMEOUT = 600
+
+VIDEO_PROMPT = "First write a dense description of the video that could be used later to answer other questions about it without watching it again: a transcript of what is said, the text shown on screen, the people, animals and objects that appear with their counts, and the timeline of the events. Then answer each of the following questions about the video."
+DESCRIPTION_PROMPT = "Answer each of the following questions using only the description of a video given below. If the description does not contain enough information to answer a question with certainty, mark it as not answerable."
+
+# Artifacts of the videos already analyzed, keyed by video ID: a dense description of the
+# video and the answers already given, keyed by question.
+videos_cache: dict[str, dict] = {}
+_video_locks: dict[str, threading.Lock] = {}
+_locks_lock = threading.Lock()
+
 @tool(
     description = "Analyzes the content of a YouTube video and answers a question about it.",
     parameters = {
@@ -20,18 +38,165 @@ client = genai.Client(api_key=os.getenv("GOOGLE_API_KEY"))
             }
         },
         "required": ["question", "youtube_url"]
-    }    
+    }
 )
 def analyze_youtube_video(question: str, youtube_url: str):
+    return analyze_youtube_video_batch([question], youtube_url)[0]
+
+
+@tool(
+    description = "Analyzes the content of a YouTube video and answers several questions about it at once. Prefer it to calling analyze_youtube_video several times on the same video.",
+    parameters = {
+        "type": "object",
+        "properties": {
+            "questions": {
+                "type": "array",
+                "items": {"type": "string"},
+                "description": "The specific questions to ask about the content of the YouTube video."
+            },
+            "youtube_url": {
+                "type": "string",
+                "description": "The URL of the YouTube video to analyze."
+            }
+        },
+        "required": ["questions", "youtube_url"]
+    }
+)
+def analyze_youtube_video_batch(questions: list[str], youtube_url: str) -> list[str]:
+    video_id = _video_id(youtube_url)
+    lock = _lock_for(video_id)
+    # The lock is held during the analysis, possibly by a call abandoned at its deadline
+    # that has not given up yet: only wait for it within the time left
+    remaining = remaining_time()
+    if not lock.acquire(timeout=remaining if remaining is not None else -1):
+        raise TimeoutError(f"Video {video_id} is still being analyzed by another request")
+    try:
+        entry = videos_cache.get(video_id)
+        if entry is None:
+            # First time we see this video: watch it once, keeping a description for the next questions
+            description, answers, parsed = _ask_video(video_id, youtube_url, questions, with_description=True)
+            if parsed:
+                entry = videos_cache[video_id] = {"description": description, "answers": {}}
+                entry["answers"].update(zip(questions, answers))
+            return answers
+
+        pending = [q for q in dict.fromkeys(questions) if q not in entry["answers"]]
+        if pending:
+            described_answers = [None] * len(pending)
+            if entry["description"]:
+                vprint(f"{' ' * 6}Answering {len(pending)} questions from the cached description of video {video_id}")
+                described_answers = _ask_description(entry["description"], pending)
+            entry["answers"].update((q, a) for q, a in zip(pending, described_answers) if a is not None)
+
+            # Watch the video again only for what its description could not answer
+            unanswered = [q for q, a in zip(pending, described_answers) if a is None]
+            if unanswered:
+                _, answers, parsed = _ask_video(video_id, youtube_url, unanswered, with_description=False)
+                if not parsed:
+                    # Don't keep answers that did not follow the format
+                    fresh = dict(zip(unanswered, answers))
+                    return [entry["answers"].get(q, fresh.get(q)) for q in questions]
+                entry["answers"].update(zip(unanswered, answers))
+
+        return [entry["answers"][q] for q in questions]
+    finally:
+        lock.release()
+
+
+def _ask_video(video_id: str, youtube_url: str, questions: list[str], with_description: bool) -> tuple[str, list[str], bool]:
+    """
+    Answers the questions with a single call watching the video, optionally describing it too.
+
+    Returns:
+        tuple[str, list[str], bool]: The description, the answers, and whether the response
+        followed the format. If it did not, every answer is the raw text of the response.
+    """
+    vprint(f"{' ' * 6}Analyzing video {video_id} for {len(questions)} questions")
+    prompt = VIDEO_PROMPT if with_description else "Answer each of the following questions about the video."
     response = client.models.generate_content(
-        model='models/gemini-2.0-flash',
+        model=MODEL,
         contents=Content(
             parts=[
                 Part(
                     file_data=FileData(file_uri=youtube_url)
                 ),
-                Part(text=question)
+                Part(text=_with_questions(prompt, questions))
             ]
+        ),
+        config=_config(
+            {
+                "type": "object",
+                "properties": {
+                    "description": {"type": "string"},
+                    "answers": {"type": "array", "items": {"type": "string"}}
+                },
+                "required": ["description", "answers"] if with_description else ["answers"]
+            }
+        )
+    )
+    try:
+        result = json.loads(response.text)
+        answers = result["answers"]
+        if len(answers) != len(questions):
+            raise ValueError("Wrong number of answers")
+        return result.get("description", ""), [str(a) for a in answers], True
+    except (ValueError, KeyError, TypeError):
+        # Keep the raw text if the model did not follow the format
+        return "", [response.text] * len(questions), False
+
+
+def _ask_description(description: str, questions: list[str]) -> list[str | None]:
+    """
+    Answers the questions from the description of a video, with None for the ones it cannot answer.
+    """
+    response = client.models.generate_content(
+        model=MODEL,
+        contents=_with_questions(DESCRIPTION_PROMPT, questions) + f"\n\nDescription of the video:\n{description}",
+        config=_config(
+            {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "answerable": {"type": "boolean"},
+                        "answer": {"type": "string"}
+                    },
+                    "required": ["answerable", "answer"]
+                }
+            }
         )
     )
-    return response.text
\ No newline at end of file
+    try:
+        results = json.loads(response.text)
+        if len(results) != len(questions):
+            raise ValueError("Wrong number of answers")
+        return [str(r["answer"]) if r["answerable"] else None for r in results]
+    except (ValueError, KeyError, TypeError):
+        return [None] * len(questions)
+
+
+def _with_questions(prompt: str, questions: list[str]) -> str:
+    numbered = "\n".join(f"{i + 1}. {q}" for i, q in enumerate(questions))
+    return f"{prompt} Give the answers in the same order as the questions.\n\nQuestions:\n{numbered}"
+
+
+def _config(response_schema: dict) -> GenerateContentConfig:
+    # Bound the request by the time left to answer the question, if any
+    return GenerateContentConfig(
+        response_mime_type="application/json",
+        response_schema=response_schema,
+        http_options=HttpOptions(timeout=int(request_timeout(default=REQUEST_TIMEOUT) * 1000))
+    )
+
+
+def _video_id(youtube_url: str) -> str:
+    """
+    Extracts the video ID from the different forms of YouTube URLs, falling back to the URL itself.
+    """
+    match = re.search(r"(?:v=|youtu\.be/|/shorts/|/embed/|/live/|/v/)([\w-]{11})", youtube_url)
+    return match.group(1) if match else youtube_url.strip()
+
+
+def _lock_for(video_id: str) -> threading.Lock:
+    with _locks_lock:
+        return _video_locks.setdefault(video_id, threading.Lock())
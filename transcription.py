@@ -0,0 +1,185 @@
+import contextvars
+import hashlib
+import io
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from openai import OpenAI
+from pydub import AudioSegment
+from pydub.exceptions import CouldntDecodeError
+from pydub.silence import detect_silence
+from pydub.utils import mediainfo
+
+from deadline import remaining_time, request_timeout
+from utils import vprint
+
+TRANSCRIPTION_MODEL = "gpt-4o-transcribe"
+
+# Audio longer than this (or bigger than the upload limit) is split into chunks.
+CHUNK_MS = 5 * 60 * 1000
+# Each chunk extends this far into the next one, so words on a cut are never lost.
+OVERLAP_MS = 2 * 1000
+# How far back from the nominal chunk end we look for a silence to cut at.
+SILENCE_SEARCH_MS = 20 * 1000
+MIN_SILENCE_MS = 400
+# Silence is anything quieter than the average loudness minus this many dB.
+SILENCE_DROP_DB = 16
+MAX_UPLOAD_BYTES = 25 * 1024 * 1024
+MAX_WORKERS = 4
+MAX_ATTEMPTS = 3
+
+# Transcripts of already processed chunks, keyed by the hash of the encoded chunk.
+chunks_cache: dict[str, str] = {}
+
+
+def transcribe_audio(client: OpenAI, file_path: str) -> str:
+    """
+    Transcribes an audio file, splitting long recordings into overlapping chunks
+    that are transcribed concurrently and stitched back together.
+
+    Args:
+        client (OpenAI): The client used for the transcription requests.
+        file_path (str): The path to the audio file.
+
+    Returns:
+        str: The full transcript of the audio file.
+    """
+    size = os.path.getsize(file_path)
+    duration = _duration_ms(file_path)
+    if size <= MAX_UPLOAD_BYTES and (duration is None or duration <= CHUNK_MS):
+        # Short audio, or audio whose length cannot be probed: send it as it is
+        return _transcribe_file(client, file_path)
+
+    # Decoding compressed formats needs ffmpeg, only do it when the file has to be chunked
+    try:
+        audio = AudioSegment.from_file(file_path)
+    except (CouldntDecodeError, OSError) as e:
+        if size > MAX_UPLOAD_BYTES:
+            raise
+        vprint(f"{' ' * 2}Could not decode the audio, transcribing it in a single request: {e}")
+        return _transcribe_file(client, file_path)
+
+    chunks = []
+    for i, segment in enumerate(_split_audio(audio)):
+        buffer = io.BytesIO()
+        segment.export(buffer, format="mp3", bitrate="64k")
+        chunks.append((f"chunk_{i}.mp3", buffer.getvalue()))
+    vprint(f"{' ' * 2}Transcribing {len(chunks)} audio chunks...")
+
+    transcript = ""
+    for text in _transcribe_chunks(client, chunks):
+        transcript = _merge_overlap(transcript, text)
+    return transcript
+
+
+def _duration_ms(file_path: str) -> float | None:
+    """
+    Reads the duration of an audio file from its metadata with ffprobe, without decoding it.
+    Returns None if it cannot be read.
+    """
+    try:
+        return float(mediainfo(file_path)["duration"]) * 1000
+    except (OSError, KeyError, ValueError) as e:
+        vprint(f"{' ' * 2}Could not read the duration of {file_path}: {e}")
+        return None
+
+
+def _transcribe_file(client: OpenAI, file_path: str) -> str:
+    with open(file_path, "rb") as fp:
+        data = fp.read()
+    return _transcribe_chunks(client, [(os.path.basename(file_path), data)])[0]
+
+
+def _split_audio(audio: AudioSegment) -> list[AudioSegment]:
+    """
+    Splits the audio at silence boundaries close to every CHUNK_MS, making each
+    chunk overlap the next one by OVERLAP_MS.
+    """
+    silence_thresh = audio.dBFS - SILENCE_DROP_DB
+    segments = []
+    start = 0
+    while start < len(audio):
+        end = start + CHUNK_MS
+        if end >= len(audio):
+            end = len(audio)
+        else:
+            window_start = max(start, end - SILENCE_SEARCH_MS)
+            silences = detect_silence(
+                audio[window_start:end],
+                min_silence_len=MIN_SILENCE_MS,
+                silence_thresh=silence_thresh
+            )
+            if silences:
+                # Cut in the middle of the last silence found in the window
+                silence_start, silence_end = silences[-1]
+                end = window_start + (silence_start + silence_end) // 2
+        segments.append(audio[start:min(end + OVERLAP_MS, len(audio))])
+        start = end
+    return segments
+
+
+def _transcribe_chunks(client: OpenAI, chunks: list[tuple[str, bytes]]) -> list[str]:
+    """
+    Transcribes the chunks concurrently. Cached chunks are not sent again and
+    failed chunks are retried up to MAX_ATTEMPTS times.
+    """
+    keys = [hashlib.sha256(data).hexdigest() for _, data in chunks]
+
+    for attempt in range(MAX_ATTEMPTS):
+        pending = [(key, chunk) for key, chunk in zip(keys, chunks) if key not in chunks_cache]
+        if not pending:
+            break
+        if attempt > 0:
+            if remaining_time(default=1) <= 0:
+                break
+            vprint(f"{' ' * 4}Retrying {len(pending)} failed audio chunks...")
+
+        with ThreadPoolExecutor(max_workers=min(MAX_WORKERS, len(pending))) as executor:
+            # Run every chunk in a copy of the current context, to keep the deadline of the question
+            futures = {
+                key: executor.submit(contextvars.copy_context().run, _transcribe_chunk, client, name, data)
+                for key, (name, data) in pending
+            }
+        for key, future in futures.items():
+            try:
+                chunks_cache[key] = future.result()
+            except Exception as e:
+                vprint(f"{' ' * 4}Audio chunk transcription failed: {e}")
+
+    failed = [key for key in keys if key not in chunks_cache]
+    if failed:
+        raise RuntimeError(f"Transcription failed for {len(failed)} of {len(keys)} audio chunks.")
+    return [chunks_cache[key] for key in keys]
+
+
+def _transcribe_chunk(client: OpenAI, name: str, data: bytes) -> str:
+    transcript = client.audio.transcriptions.create(
+        model=TRANSCRIPTION_MODEL,
+        file=(name, data),
+        temperature=0,
+        timeout=request_timeout(default=600)
+    )
+    return transcript.text
+
+
+def _normalize_word(word: str) -> str:
+    return re.sub(r"\W", "", word.lower())
+
+
+def _merge_overlap(left: str, right: str, max_words: int = 40, min_words: int = 2) -> str:
+    """
+    Joins two consecutive transcripts, dropping the words at the start of the
+    right one that repeat the end of the left one because of the chunk overlap.
+    """
+    if not left:
+        return right
+    left_words, right_words = left.split(), right.split()
+    left_norm = [_normalize_word(w) for w in left_words[-max_words:]]
+    right_norm = [_normalize_word(w) for w in right_words[:max_words]]
+
+    # Look for the longest suffix of the left transcript found at the start of the right one
+    for size in range(min(len(left_norm), len(right_norm)), min_words - 1, -1):
+        if left_norm[-size:] == right_norm[:size]:
+            return " ".join(left_words + right_words[size:])
+    return " ".join(left_words + right_words)
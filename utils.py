@@ -7,6 +7,7 @@ class FileStrategy(Enum):
     TRANSCRIPTION = 0
     VISION = 1
     ASSISTANTS = 2
+    TABULAR = 3
 
 EXT_TO_STRATEGY = {
     ".mp3": FileStrategy.TRANSCRIPTION,
@@ -18,8 +19,8 @@ EXT_TO_STRATEGY = {
     ".webp": FileStrategy.VISION,
     ".gif": FileStrategy.VISION,
     ".py": FileStrategy.ASSISTANTS,
-    ".xlsx": FileStrategy.ASSISTANTS,
-    ".csv": FileStrategy.ASSISTANTS,
+    ".xlsx": FileStrategy.TABULAR,
+    ".csv": FileStrategy.TABULAR,
 }
 
 def get_filename_ext(file_name: str):
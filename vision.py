@@ -0,0 +1,166 @@
+import base64
+import hashlib
+import io
+import os
+import time
+
+from openai import OpenAI
+from PIL import Image, ImageSequence
+
+from deadline import request_timeout
+from utils import vprint
+
+# The model downscales images to fit in MAX_SIDE x MAX_SIDE and then to a shortest
+# side of MAX_SHORT_SIDE, so any resolution above that is wasted bytes and tokens.
+MAX_SIDE = 2048
+MAX_SHORT_SIDE = 768
+JPEG_QUALITY = 85
+# Images smaller than this are sent inline as data URLs instead of through the Files API.
+# In full-history mode the inlined images are sent again with every request, so only tiny
+# ones are worth it. In chained mode they are sent once.
+INLINE_MAX_BYTES = 64 * 1024
+CHAINED_INLINE_MAX_BYTES = 512 * 1024
+# Latency assumed for a Files API upload until one has been measured.
+ESTIMATED_UPLOAD_SECONDS = 0.5
+# Maximum number of frames sent for an animated GIF.
+GIF_MAX_FRAMES = 4
+
+# Running totals, used to report the savings of the preprocessing stage.
+stats = {
+    "images": 0,
+    "original_bytes": 0,
+    "sent_bytes": 0,
+    "inline": 0,
+    "uploads": 0,
+    "upload_seconds": 0.0,
+}
+
+
+def image_inputs(client: OpenAI, file_path: str, chained: bool = False) -> list[dict]:
+    """
+    Preprocesses an image file and prepares it to be passed to the model.
+    Images are downscaled and recompressed, animated GIFs are converted to a few
+    representative frames, and small results are inlined as data URLs.
+
+    Args:
+        client (OpenAI): The client used to upload the images that are not inlined.
+        file_path (str): The path to the image file.
+        chained (bool): Whether the requests are chained by response ID, in which case the
+            images are only sent once and bigger ones are inlined.
+
+    Returns:
+        list[dict]: The input_image content items, one per frame.
+    """
+    start = time.perf_counter()
+    original_bytes = os.path.getsize(file_path)
+    frames = prepare_image(file_path)
+
+    inline_max_bytes = CHAINED_INLINE_MAX_BYTES if chained else INLINE_MAX_BYTES
+    inputs = []
+    inlined = 0
+    upload_seconds = 0.0
+    for i, (data, mime_type) in enumerate(frames):
+        if len(data) <= inline_max_bytes:
+            inlined += 1
+            inputs.append({
+                "type": "input_image",
+                "image_url": f"data:{mime_type};base64,{base64.b64encode(data).decode()}",
+            })
+        else:
+            upload_start = time.perf_counter()
+            extension = mime_type.split("/")[-1]
+            file = client.files.create(
+                file=(f"image_{i}.{extension}", data, mime_type),
+                purpose="vision",
+                timeout=request_timeout(default=120)
+            )
+            upload_seconds += time.perf_counter() - upload_start
+            stats["uploads"] += 1
+            inputs.append({
+                "type": "input_image",
+                "file_id": file.id,
+            })
+
+    sent_bytes = sum(len(data) for data, _ in frames)
+    stats["images"] += 1
+    stats["inline"] += inlined
+    stats["original_bytes"] += original_bytes
+    stats["sent_bytes"] += sent_bytes
+    stats["upload_seconds"] += upload_seconds
+    _report(original_bytes, sent_bytes, inlined, time.perf_counter() - start)
+    return inputs
+
+
+def prepare_image(file_path: str) -> list[tuple[bytes, str]]:
+    """
+    Downscales and recompresses an image, splitting animated images into frames.
+
+    Returns:
+        list[tuple[bytes, str]]: The encoded frames with their MIME type.
+    """
+    with Image.open(file_path) as image:
+        if getattr(image, "is_animated", False) and image.n_frames > 1:
+            return [_encode(frame) for frame in _representative_frames(image)]
+
+        original_format = image.format
+        resized = _downscale(image)
+        data, mime_type = _encode(resized)
+
+    # Keep the original file if recompressing it did not make it any smaller
+    if resized.size == image.size and original_format in ("JPEG", "PNG", "WEBP"):
+        original_bytes = os.path.getsize(file_path)
+        if original_bytes <= len(data):
+            with open(file_path, "rb") as fp:
+                return [(fp.read(), Image.MIME[original_format])]
+    return [(data, mime_type)]
+
+
+def _downscale(image: Image.Image) -> Image.Image:
+    width, height = image.size
+    scale = min(1.0, MAX_SIDE / max(width, height), MAX_SHORT_SIDE / min(width, height))
+    if scale < 1.0:
+        return image.resize((max(1, round(width * scale)), max(1, round(height * scale))), Image.LANCZOS)
+    image.load()
+    return image
+
+
+def _representative_frames(image: Image.Image) -> list[Image.Image]:
+    """
+    Picks up to GIF_MAX_FRAMES evenly spaced frames, skipping duplicates.
+    """
+    step = max(1, image.n_frames / GIF_MAX_FRAMES)
+    wanted = {int(i * step) for i in range(min(GIF_MAX_FRAMES, image.n_frames))}
+
+    frames, seen = [], set()
+    for index, frame in enumerate(ImageSequence.Iterator(image)):
+        if index not in wanted:
+            continue
+        frame = _downscale(frame.convert("RGB"))
+        digest = hashlib.sha256(frame.tobytes()).digest()
+        if digest not in seen:
+            seen.add(digest)
+            frames.append(frame)
+    return frames
+
+
+def _encode(image: Image.Image) -> tuple[bytes, str]:
+    buffer = io.BytesIO()
+    if image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info):
+        # Keep transparency, which JPEG cannot represent
+        image.convert("RGBA").save(buffer, format="PNG", optimize=True)
+        return buffer.getvalue(), "image/png"
+    image.convert("RGB").save(buffer, format="JPEG", quality=JPEG_QUALITY, optimize=True)
+    return buffer.getvalue(), "image/jpeg"
+
+
+def _report(original_bytes: int, sent_bytes: int, inlined: int, elapsed: float):
+    saved_bytes = original_bytes - sent_bytes
+    # Every inlined image saves a Files API round trip, estimated from the uploads seen so far
+    if stats["uploads"]:
+        saved_latency = f"~{inlined * stats['upload_seconds'] / stats['uploads']:.2f}s"
+    else:
+        saved_latency = f"~{inlined * ESTIMATED_UPLOAD_SECONDS:.2f}s (estimated, no upload measured yet)"
+    vprint(
+        f"{' ' * 2}Image preprocessed in {elapsed:.2f}s: {original_bytes} -> {sent_bytes} bytes "
+        f"({saved_bytes} saved), {inlined} inlined, upload latency saved: {saved_latency}"
+    )